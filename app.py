@@ -1,10 +1,14 @@
 import streamlit as st
 import os
-import tempfile
 import time
-from main import BrochureGenerator, PDFExporter, validate_url, validate_api_key
-import requests
+import threading
+from main import (BrochureGenerator, PDFExporter, StageTracer, FetchEngine, HTTPClientPool, LRUCache,
+                  SQLiteCache, ScrapeCache, TieredCache, validate_url, validate_api_key, get_http_pool)
 import base64
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
 st.set_page_config(
     page_title="AI Marketing Brochure Generator",
@@ -293,6 +297,11 @@ def initialize_session_state():
         st.session_state.company_name = ""
     if 'website_url' not in st.session_state:
         st.session_state.website_url = ""
+    if 'brochure_variants' not in st.session_state:
+        st.session_state.brochure_variants = {}
+    if 'pdf_renders' not in st.session_state:
+        # PDF renders keyed by content hash; dropped with the session
+        st.session_state.pdf_renders = OrderedDict()
 
 def display_header():
     st.markdown("""
@@ -303,47 +312,293 @@ def display_header():
     """, unsafe_allow_html=True)
 
 def get_company_favicon(url: str) -> str:
+    """
+    Return the base64 favicon, "" when the service answers that the domain
+    has no icon, or None when the lookup failed and may succeed later
+    """
     try:
         favicon_url = f"https://www.google.com/s2/favicons?domain={url}&sz=32"
-        response = requests.get(favicon_url, timeout=5)
+        response = get_http_pool().get(favicon_url, timeout=5)
         if response.status_code == 200:
             return base64.b64encode(response.content).decode()
+        if response.status_code == 404:
+            return ""
     except:
         pass
     return None
 
+class FaviconStore:
+    """
+    Favicons cached by domain and shared by every session. Missing icons
+    are fetched on a background thread so the company header never waits
+    for them. Domains the service reports as having no icon are cached as
+    well; failed lookups are not, so they are retried on the next visit.
+    """
+    
+    def __init__(self, cache: TieredCache, max_workers: int = 4):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = {}
+        self.lock = threading.Lock()
+    
+    def lookup(self, url: str):
+        """Return (favicon, None) when cached, otherwise (None, future)"""
+        domain = (urlparse(url).hostname or url).lower()
+        favicon = self.cache.get(domain)
+        if favicon is not None:
+            return favicon or None, None
+        
+        with self.lock:
+            future = self.pending.get(domain)
+            if future is None:
+                future = self.executor.submit(self._fetch, domain)
+                self.pending[domain] = future
+        return None, future
+    
+    def _fetch(self, domain: str):
+        try:
+            favicon = get_company_favicon(domain)
+            if favicon is not None:
+                self.cache.set(domain, favicon)
+            return favicon or None
+        finally:
+            with self.lock:
+                self.pending.pop(domain, None)
+
+@st.cache_resource
+def get_favicon_store() -> FaviconStore:
+    persistent = None
+    cache_dir = os.getenv("BROCHURE_CACHE_DIR")
+    if cache_dir:
+        persistent = SQLiteCache(os.path.join(cache_dir, "favicons.db"), ttl=7 * 24 * 3600, table='favicons')
+    return FaviconStore(TieredCache(LRUCache(max_entries=512, ttl=24 * 3600), persistent))
+
+def render_favicon(placeholder, favicon: str):
+    if favicon:
+        placeholder.markdown(f'<img src="data:image/png;base64,{favicon}" width="32" style="margin-top: 8px;">', unsafe_allow_html=True)
+    else:
+        placeholder.markdown("🏢")
+
 def display_company_info(company_name: str, website_url: str):
-    favicon = get_company_favicon(website_url)
+    """
+    Render the company header straight away. Returns a fill_favicon(wait=False)
+    callback that swaps in the icon once its background fetch has finished.
+    """
+    favicon, future = get_favicon_store().lookup(website_url)
     
     col1, col2 = st.columns([1, 20])
     
     with col1:
-        if favicon:
-            st.markdown(f'<img src="data:image/png;base64,{favicon}" width="32" style="margin-top: 8px;">', unsafe_allow_html=True)
-        else:
-            st.markdown("🏢")
+        placeholder = st.empty()
+        render_favicon(placeholder, favicon)
     
     with col2:
         st.markdown(f"**{company_name}** • {website_url}")
+    
+    def fill_favicon(wait: bool = False):
+        nonlocal future
+        if future is None or not (wait or future.done()):
+            return
+        try:
+            render_favicon(placeholder, future.result(timeout=5))
+        except Exception:
+            pass
+        future = None
+    
+    return fill_favicon
 
-def create_pdf_download_link(content: str, filename: str) -> str:
-    try:
-        pdf_exporter = PDFExporter()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            pdf_path = tmp_file.name
-        
-        pdf_exporter.markdown_to_pdf(content, pdf_path)
-        
-        with open(pdf_path, 'rb') as pdf_file:
-            pdf_bytes = pdf_file.read()
-        
-        os.unlink(pdf_path)
-        
-        return pdf_bytes
-    except Exception as e:
-        st.error(f"Error creating PDF: {e}")
+# Sizing for the resources shared by every session on this server
+OPENAI_MAX_CONNECTIONS = 50
+SCRAPE_WORKERS = 16
+# The shared fetch engine lets at most SCRAPE_PER_HOST requests run against
+# one host at a time, so the scrape pool keeps that many connections per
+# host alive and never discards one; SCRAPE_POOL_HOSTS hosts stay warm
+SCRAPE_PER_HOST = 4
+SCRAPE_POOL_HOSTS = 64
+COMPLETION_TTL = 24 * 3600
+
+@st.cache_resource
+def get_generator(api_key: str) -> BrochureGenerator:
+    """One generator per API key, reused across reruns and sessions"""
+    scrape_cache = None
+    link_cache_store = None
+    completion_store = None
+    cache_dir = os.getenv("BROCHURE_CACHE_DIR")
+    if cache_dir:
+        scrape_cache = ScrapeCache(os.path.join(cache_dir, "pages.db"))
+        link_cache_store = SQLiteCache(os.path.join(cache_dir, "links.db"), table='links')
+        completion_store = SQLiteCache(os.path.join(cache_dir, "completions.db"), ttl=COMPLETION_TTL,
+                                       max_entries=1000, table='completions')
+    
+    return BrochureGenerator(
+        api_key=api_key,
+        model="gpt-4o-mini",
+        fetch_engine=FetchEngine(
+            max_workers=SCRAPE_WORKERS,
+            per_host_limit=SCRAPE_PER_HOST,
+            pool=HTTPClientPool(pool_connections=SCRAPE_POOL_HOSTS, pool_maxsize=SCRAPE_PER_HOST),
+            cache=scrape_cache
+        ),
+        link_cache=TieredCache(persistent=link_cache_store),
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        completion_cache=TieredCache(LRUCache(max_entries=200, ttl=COMPLETION_TTL), completion_store)
+    )
+
+@st.cache_resource
+def get_pdf_exporter() -> PDFExporter:
+    return PDFExporter()
+
+# PDF renders kept per session beyond those of the brochures on screen
+PDF_RENDER_ENTRIES = 8
+
+@st.cache_resource
+def get_pdf_render_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=2)
+
+def prerender_pdf(content: str):
+    """Start rendering content as PDF in the background, memoized by content hash"""
+    renders = st.session_state.pdf_renders
+    key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    if key in renders:
+        renders.move_to_end(key)
+        return renders[key]
+    
+    future = get_pdf_render_pool().submit(get_pdf_exporter().markdown_to_pdf_bytes, content)
+    renders[key] = future
+    # Every rerun asks again for the render of each variant on screen, so
+    # those are never evicted to make room for one another
+    while len(renders) > PDF_RENDER_ENTRIES + len(st.session_state.brochure_variants):
+        renders.popitem(last=False)
+    return future
+
+def variant_label(language: str, tone: str) -> str:
+    return f"{language} · {tone}"
+
+def stage_progress(progress_bar, status_text):
+    """
+    Build a stage listener that moves the progress bar as pipeline stages
+    finish. In progressive mode pages keep arriving after writing has
+    started, so the bar never moves back; only the status text changes.
+    """
+    highest = 0
+    
+    def on_stage(span):
+        nonlocal highest
+        stage = span['name']
+        attributes = span['attributes']
+        if stage == 'landing_fetch':
+            value, status = 10, "🔗 Selecting relevant pages..."
+        elif stage == 'link_selection':
+            value, status = 25, f"📊 Extracting relevant content (0/{attributes['links']} pages)..."
+        elif stage == 'subpage_fetch':
+            value = 25 + 40 * attributes['index'] // max(attributes['total'], 1)
+            status = f"📊 Extracting relevant content ({attributes['index']}/{attributes['total']} pages)..."
+        elif stage == 'prompt_build':
+            value, status = 70, "✨ Generating brochure..."
+        elif stage == 'first_token':
+            value, status = 75, "✍️ Writing brochure..."
+        else:
+            return
+        if value > highest:
+            highest = value
+            progress_bar.progress(value)
+        status_text.text(status)
+    return on_stage
+
+def generation_progress(chars: int) -> int:
+    """Progress while the brochure streams, assuming a brochure of roughly 3,000 characters"""
+    return min(95, 75 + chars // 150)
+
+class RenderCoalescer:
+    """
+    Collects streamed chunks and re-renders the placeholder at most every
+    interval seconds, or sooner once max_chars new characters are waiting,
+    rather than once per chunk.
+    """
+    
+    def __init__(self, placeholder, interval: float = 0.1, max_chars: int = 1000):
+        self.placeholder = placeholder
+        self.interval = interval
+        self.max_chars = max_chars
+        self.content = ""
+        self.rendered = 0
+        self.last_render = 0.0
+    
+    def add(self, chunk: str):
+        self.content += chunk
+        if (time.monotonic() - self.last_render >= self.interval
+                or len(self.content) - self.rendered >= self.max_chars):
+            self.flush()
+    
+    def flush(self):
+        """Render any chunks not yet shown"""
+        if len(self.content) != self.rendered:
+            self.placeholder.markdown(self.content)
+            self.rendered = len(self.content)
+            self.last_render = time.monotonic()
+
+def format_stage_timings(tracer: StageTracer) -> str:
+    durations = tracer.durations()
+    parts = [
+        f"Landing page {durations.get('landing_fetch', 0):.1f}s",
+        f"Link selection {durations.get('link_selection', 0):.1f}s",
+        f"Subpages {durations.get('subpage_fetch', 0):.1f}s",
+        f"Prompt build {durations.get('prompt_build', 0):.2f}s",
+    ]
+    first_tokens = [span['duration_ms'] for span in tracer.spans if span['name'] == 'first_token']
+    if first_tokens:
+        parts.append(f"First token {min(first_tokens) / 1000:.1f}s")
+    rates = [span['attributes']['tokens_per_second'] for span in tracer.spans if span['name'] == 'generation']
+    if rates:
+        parts.append(f"{sum(rates) / len(rates):.0f} tokens/s")
+    return "⏱️ " + " · ".join(parts)
+
+def display_download_options(content: str, file_stem: str, key: str = ""):
+    """
+    Render the download buttons. The PDF is rendered in the background; if
+    it is not ready yet, returns a callback that fills in its button once
+    the rest of the page has been drawn.
+    """
+    pdf_render = prerender_pdf(content)
+    
+    st.markdown('<div class="download-section">', unsafe_allow_html=True)
+    st.markdown("### 📥 Download Options")
+    
+    col_md, col_pdf = st.columns(2)
+    
+    with col_md:
+        st.download_button(
+            label="📝 Download Markdown",
+            data=content,
+            file_name=f"{file_stem}.md",
+            mime="text/markdown",
+            key=f"download_md_{key}"
+        )
+    
+    with col_pdf:
+        pdf_slot = st.empty()
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    def fill_pdf_download():
+        try:
+            pdf_bytes = pdf_render.result()
+        except Exception as e:
+            pdf_slot.error(f"Error creating PDF: {e}")
+            return
+        pdf_slot.download_button(
+            label="📄 Download PDF",
+            data=pdf_bytes,
+            file_name=f"{file_stem}.pdf",
+            mime="application/pdf",
+            key=f"download_pdf_{key}"
+        )
+    
+    if pdf_render.done():
+        fill_pdf_download()
         return None
+    pdf_slot.button("⏳ Preparing PDF...", disabled=True, key=f"preparing_pdf_{key}")
+    return fill_pdf_download
 
 def check_api_key():
     api_key = os.getenv("OPENAI_API_KEY")
@@ -408,10 +663,14 @@ def main():
             "Japanese": "Japanese"
         }
         
-        selected_language = st.selectbox(
+        selected_languages = st.multiselect(
             "Language",
             options=list(languages.keys()),
-            index=0
+            default=["English"]
+        )
+        translate = st.checkbox(
+            "Translate from first",
+            help="Write the brochure in the first language, then translate it into the others"
         )
     
     with col4:
@@ -425,10 +684,10 @@ def main():
             "Humorous": "Humorous"
         }
         
-        selected_tone = st.selectbox(
+        selected_tones = st.multiselect(
             "Tone",
             options=list(tones.keys()),
-            index=0
+            default=["Professional"]
         )
     
     with col5:
@@ -440,7 +699,16 @@ def main():
         
         generate_button = st.button(
             "Generate",
-            disabled=not (company_name and website_url and url_valid)
+            disabled=not (company_name and website_url and url_valid
+                          and selected_languages and selected_tones)
+        )
+        regenerate = st.checkbox(
+            "Regenerate",
+            help="Ignore brochures cached for the same website and settings"
+        )
+        progressive = st.checkbox(
+            "Write while loading",
+            help="Start writing a single brochure from the landing page while the other pages load"
         )
     
     if website_url and not url_valid:
@@ -453,91 +721,144 @@ def main():
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Show brochure content when generating
+    fill_favicon = None
+    pending_downloads = []
     if generate_button:
         st.session_state.company_name = company_name
         st.session_state.website_url = website_url
         
-        display_company_info(company_name, website_url)
+        variants = [(language, tone) for language in selected_languages for tone in selected_tones]
+        
+        fill_favicon = display_company_info(company_name, website_url)
         st.markdown("---")
         
         try:
-            generator = BrochureGenerator(
-                api_key=api_key,
-                model="gpt-4o-mini"
-            )
+            generator = get_generator(api_key)
             
             progress_bar = st.progress(0)
             status_text = st.empty()
-            
             status_text.text("🔍 Analyzing website...")
-            progress_bar.progress(25)
-            
-            status_text.text("📊 Extracting relevant content...")
-            progress_bar.progress(50)
-            
-            status_text.text("✨ Generating brochure...")
-            progress_bar.progress(75)
-            
-            brochure_placeholder = st.empty()
-            content = ""
+            tracer = StageTracer(
+                listeners=[stage_progress(progress_bar, status_text), lambda span: fill_favicon()],
+                job=website_url
+            )
+            progress = 0
             
-            try:
-                for chunk in generator.stream_brochure(
-                    company_name=company_name,
-                    url=website_url,
-                    language=selected_language,
-                    tone=selected_tone
-                ):
-                    if chunk.startswith("Error"):
-                        st.error(chunk)
-                        break
-                    content += chunk
-                    brochure_placeholder.markdown(content)
-                    time.sleep(0.05)
+            if len(variants) == 1:
+                selected_language, selected_tone = variants[0]
+                renderer = RenderCoalescer(st.empty())
+                if progressive:
+                    stream_brochure = generator.stream_brochure_progressive
+                else:
+                    stream_brochure = generator.stream_brochure
                 
-                if not content.startswith("Error"):
-                    progress_bar.progress(100)
-                    status_text.text("✅ Brochure generated successfully!")
-                    
-                    st.session_state.brochure_content = content
-                    st.session_state.brochure_generated = True
+                try:
+                    for chunk in stream_brochure(
+                        company_name=company_name,
+                        url=website_url,
+                        language=selected_language,
+                        tone=selected_tone,
+                        tracer=tracer,
+                        regenerate=regenerate
+                    ):
+                        if chunk.startswith("Error"):
+                            st.error(chunk)
+                            break
+                        renderer.add(chunk)
+                        if generation_progress(len(renderer.content)) != progress:
+                            progress = generation_progress(len(renderer.content))
+                            progress_bar.progress(progress)
                     
-                    st.markdown('<div class="download-section">', unsafe_allow_html=True)
-                    st.markdown("### 📥 Download Options")
+                    renderer.flush()
+                    content = renderer.content
+                    if not content.startswith("Error"):
+                        progress_bar.progress(100)
+                        status_text.text("✅ Brochure generated successfully!")
+                        st.caption(format_stage_timings(tracer))
+                        
+                        st.session_state.brochure_content = content
+                        st.session_state.brochure_variants = {}
+                        st.session_state.brochure_generated = True
+                        
+                        pending_downloads.append(display_download_options(
+                            st.session_state.brochure_content,
+                            f"{st.session_state.company_name}_brochure"
+                        ))
+                    else:
+                        st.session_state.brochure_generated = False
+                        
+                except Exception as stream_error:
+                    st.error(f"Error during brochure generation: {stream_error}")
+                    st.session_state.brochure_generated = False
+            else:
+                tabs = st.tabs([variant_label(*variant) for variant in variants])
+                renderers = {}
+                for tab, variant in zip(tabs, variants):
+                    with tab:
+                        renderers[variant] = RenderCoalescer(st.empty())
+                
+                failed = set()
+                
+                try:
+                    if translate and len(selected_languages) > 1:
+                        stream_variants = generator.stream_translated_variants
+                    else:
+                        stream_variants = generator.stream_variants
                     
-                    col_md, col_pdf = st.columns(2)
+                    for variant, chunk in stream_variants(
+                        company_name=company_name,
+                        url=website_url,
+                        variants=variants,
+                        tracer=tracer,
+                        regenerate=regenerate
+                    ):
+                        if variant in failed:
+                            continue
+                        if chunk.startswith("Error"):
+                            failed.add(variant)
+                            renderers[variant].placeholder.error(chunk)
+                            continue
+                        renderers[variant].add(chunk)
+                        streamed = sum(len(renderer.content) for renderer in renderers.values()) // len(variants)
+                        if generation_progress(streamed) != progress:
+                            progress = generation_progress(streamed)
+                            progress_bar.progress(progress)
                     
-                    with col_md:
-                        st.download_button(
-                            label="📝 Download Markdown",
-                            data=st.session_state.brochure_content,
-                            file_name=f"{st.session_state.company_name}_brochure.md",
-                            mime="text/markdown"
-                        )
+                    for variant, renderer in renderers.items():
+                        if variant not in failed:
+                            renderer.flush()
+                    contents = {variant: renderer.content for variant, renderer in renderers.items()}
                     
-                    with col_pdf:
-                        if st.button("📄 Generate PDF"):
-                            with st.spinner("Generating PDF..."):
-                                pdf_bytes = create_pdf_download_link(
-                                    st.session_state.brochure_content,
-                                    f"{st.session_state.company_name}_brochure.pdf"
-                                )
-                                
-                                if pdf_bytes:
-                                    st.download_button(
-                                        label="📄 Download PDF",
-                                        data=pdf_bytes,
-                                        file_name=f"{st.session_state.company_name}_brochure.pdf",
-                                        mime="application/pdf"
-                                    )
+                    completed = {
+                        variant_label(*variant): contents[variant]
+                        for variant in variants if variant not in failed
+                    }
                     
-                    st.markdown('</div>', unsafe_allow_html=True)
-                else:
+                    if completed:
+                        progress_bar.progress(100)
+                        status_text.text(f"✅ {len(completed)} brochures generated successfully!")
+                        st.caption(format_stage_timings(tracer))
+                        
+                        st.session_state.brochure_variants = completed
+                        st.session_state.brochure_content = next(iter(completed.values()))
+                        st.session_state.brochure_generated = True
+                        
+                        for tab, variant in zip(tabs, variants):
+                            if variant in failed:
+                                continue
+                            language, tone = variant
+                            with tab:
+                                pending_downloads.append(display_download_options(
+                                    contents[variant],
+                                    f"{company_name}_{language}_{tone}_brochure",
+                                    key=f"{language}_{tone}"
+                                ))
+                    else:
+                        st.session_state.brochure_generated = False
+                        
+                except Exception as stream_error:
+                    st.error(f"Error during brochure generation: {stream_error}")
                     st.session_state.brochure_generated = False
-                    
-            except Exception as stream_error:
-                st.error(f"Error during brochure generation: {stream_error}")
-                st.session_state.brochure_generated = False
             
         except Exception as e:
             st.error(f"Error initializing brochure generator: {e}")
@@ -547,43 +868,40 @@ def main():
         st.markdown("### 📄 Generated Brochure")
         
         if st.session_state.company_name and st.session_state.website_url:
-            display_company_info(st.session_state.company_name, st.session_state.website_url)
+            fill_favicon = display_company_info(st.session_state.company_name, st.session_state.website_url)
             st.markdown("---")
         
-        st.markdown('<div class="brochure-content">', unsafe_allow_html=True)
-        st.markdown(st.session_state.brochure_content)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        st.markdown('<div class="download-section">', unsafe_allow_html=True)
-        st.markdown("### 📥 Download Options")
-        
-        col_md, col_pdf = st.columns(2)
-        
-        with col_md:
-            st.download_button(
-                label="📝 Download Markdown",
-                data=st.session_state.brochure_content,
-                file_name=f"{st.session_state.company_name}_brochure.md",
-                mime="text/markdown"
-            )
-        
-        with col_pdf:
-            if st.button("📄 Generate PDF"):
-                with st.spinner("Generating PDF..."):
-                    pdf_bytes = create_pdf_download_link(
-                        st.session_state.brochure_content,
-                        f"{st.session_state.company_name}_brochure.pdf"
-                    )
+        if st.session_state.brochure_variants:
+            labels = list(st.session_state.brochure_variants.keys())
+            for tab, label in zip(st.tabs(labels), labels):
+                content = st.session_state.brochure_variants[label]
+                language, tone = label.split(" · ")
+                with tab:
+                    st.markdown('<div class="brochure-content">', unsafe_allow_html=True)
+                    st.markdown(content)
+                    st.markdown('</div>', unsafe_allow_html=True)
                     
-                    if pdf_bytes:
-                        st.download_button(
-                            label="📄 Download PDF",
-                            data=pdf_bytes,
-                            file_name=f"{st.session_state.company_name}_brochure.pdf",
-                            mime="application/pdf"
-                        )
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+                    pending_downloads.append(display_download_options(
+                        content,
+                        f"{st.session_state.company_name}_{language}_{tone}_brochure",
+                        key=f"{language}_{tone}"
+                    ))
+        else:
+            st.markdown('<div class="brochure-content">', unsafe_allow_html=True)
+            st.markdown(st.session_state.brochure_content)
+            st.markdown('</div>', unsafe_allow_html=True)
+            
+            pending_downloads.append(display_download_options(
+                st.session_state.brochure_content,
+                f"{st.session_state.company_name}_brochure"
+            ))
+    
+    # The page is fully drawn by now, so waiting for the icon and PDFs delays nothing
+    for fill_pdf_download in pending_downloads:
+        if fill_pdf_download is not None:
+            fill_pdf_download()
+    if fill_favicon is not None:
+        fill_favicon(wait=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
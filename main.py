@@ -1,15 +1,20 @@
 import os
-import requests
 import json
-from bs4 import BeautifulSoup
-from openai import OpenAI
+import sqlite3
+import hashlib
+import codecs
+import csv
+import re
+import argparse
+import math
 from dotenv import load_dotenv
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import markdown
 import time
-from urllib.parse import urljoin, urlparse
+import threading
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlparse, urlunparse
 import logging
 
 # Configure logging
@@ -18,65 +23,599 @@ logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
 
 MODEL = "gpt-4.1-nano" 
+TEMPERATURE = 0.7
+
+# Heavy dependencies (requests, BeautifulSoup, the OpenAI SDK and ReportLab)
+# are imported where they are first used, so importing this module
+# stays cheap and does not require an API key.
 
 def validate_api_key(api_key):
     """Validate OpenAI API key format"""
     return api_key and (api_key.startswith('sk-') or api_key.startswith('sk-proj-'))
 
-# Validate API key before initializing OpenAI client
-if not validate_api_key(api_key):
-    logger.error("Invalid or missing OpenAI API key")
-    raise ValueError("Please set a valid OPENAI_API_KEY in your environment variables")
 
-openai = OpenAI()
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def _supported_encodings():
+    """Return the Accept-Encoding value supported by the installed decoders"""
+    encodings = ['gzip', 'deflate']
+    try:
+        import brotli  # noqa: F401
+        encodings.append('br')
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append('br')
+        except ImportError:
+            pass
+    return ', '.join(encodings)
+
+class HTTPClientPool:
+    """
+    Shared HTTP connection pool with keep-alive, used for every outbound fetch.
+    Uses a pooled requests.Session by default, or an httpx client when HTTP/2
+    is requested and the h2 package is installed.
+    """
+    
+    def __init__(self, pool_connections: int = 20, pool_maxsize: int = 10,
+                 http2: bool = False, max_retries: int = 0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.headers = {
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': _supported_encodings(),
+            'Connection': 'keep-alive'
+        }
+        self.http2 = http2 and self._http2_available()
+        self.client = self._build_client(max_retries)
+    
+    @staticmethod
+    def _http2_available():
+        try:
+            import httpx  # noqa: F401
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP/2 requested but httpx[http2] is not installed; using HTTP/1.1")
+            return False
+    
+    def _build_client(self, max_retries: int):
+        if self.http2:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=self.pool_connections * self.pool_maxsize,
+                max_keepalive_connections=self.pool_connections * self.pool_maxsize
+            )
+            return httpx.Client(http2=True, limits=limits, headers=self.headers,
+                                follow_redirects=True)
+        
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers.update(self.headers)
+        # pool_connections is the number of hosts kept, pool_maxsize the
+        # number of connections kept per host
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=max_retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def get(self, url: str, timeout: float = 10, headers: dict = None):
+        """Issue a GET request over a pooled connection"""
+        return self.client.get(url, headers=headers, timeout=timeout)
+    
+    def fetch(self, url: str, timeout: float = 10, headers: dict = None,
+              max_bytes: int = None):
+        """
+        Stream a GET response body, stopping once max_bytes have been read.
+        Returns (response, content, truncated).
+        """
+        chunks = []
+        size = 0
+        truncated = False
+        
+        if self.http2:
+            request = self.client.stream('GET', url, headers=headers, timeout=timeout)
+        else:
+            request = self.client.get(url, headers=headers, timeout=timeout, stream=True)
+        
+        with request as response:
+            body = response.iter_bytes() if self.http2 else response.iter_content(chunk_size=16 * 1024)
+            for chunk in body:
+                chunks.append(chunk)
+                size += len(chunk)
+                if max_bytes and size >= max_bytes:
+                    truncated = True
+                    break
+        
+        content = b''.join(chunks)
+        if max_bytes:
+            content = content[:max_bytes]
+        return response, content, truncated
+    
+    def close(self):
+        self.client.close()
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_http_pool() -> HTTPClientPool:
+    """Return the process-wide shared HTTP connection pool"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPClientPool()
+        return _default_pool
 
+def normalize_url(url: str) -> str:
+    """Normalize a URL so that equivalent URLs share a cache key"""
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        netloc = f"{netloc}:{parts.port}"
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = '&'.join(sorted(parts.query.split('&'))) if parts.query else ''
+    return urlunparse((scheme, netloc, path, '', query, ''))
+
+class SQLiteCache:
+    """
+    Small persistent key/value store backed by SQLite, with a TTL and
+    size-bounded LRU eviction. Values are stored as JSON.
+    """
+    
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 5000,
+                 table: str = 'cache'):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.table = table
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+            )
+    
+    def is_fresh(self, stored_at: float) -> bool:
+        return self.ttl is None or time.time() - stored_at < self.ttl
+    
+    def get_entry(self, key: str):
+        """Return (value, stored_at) for a key, even if it has expired, or None"""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0]), row[1]
+    
+    def get(self, key: str):
+        """Return the cached value if present and fresh, otherwise None"""
+        entry = self.get_entry(key)
+        if entry is None or not self.is_fresh(entry[1]):
+            return None
+        return entry[0]
+    
+    def set(self, key: str, value):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict()
+    
+    def touch(self, key: str):
+        """Mark an entry as freshly stored, e.g. after a successful revalidation"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE {self.table} SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key)
+            )
+    
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+    
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {self.table}")
+    
+    def close(self):
+        self.conn.close()
+    
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with an optional TTL.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value if present and fresh, otherwise None"""
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at >= self.ttl:
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (value, time.time())
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+    
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+    
+    def __len__(self):
+        return len(self.data)
+
+class TieredCache:
+    """
+    Content-addressed cache with an in-memory LRU tier and an optional
+    persistent SQLite tier. Keeps hit and miss counters.
+    """
+    
+    def __init__(self, memory: LRUCache = None, persistent: SQLiteCache = None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash the given JSON-serializable parts into a cache key"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+    
+    def set(self, key: str, value):
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+class ScrapeCache(SQLiteCache):
+    """
+    Persistent cache of extracted page content (title, text and links) keyed
+    by normalized URL. Stale entries are kept so they can be revalidated with
+    a conditional GET.
+    """
+    
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 5000):
+        super().__init__(path, ttl=ttl, max_entries=max_entries, table='pages')
+    
+    def lookup(self, url: str):
+        """Return (page, fresh) for a URL, or (None, False) on a miss"""
+        entry = self.get_entry(normalize_url(url))
+        if entry is None:
+            return None, False
+        page, stored_at = entry
+        return page, self.is_fresh(stored_at)
+    
+    def store(self, url: str, page: dict):
+        self.set(normalize_url(url), page)
+    
+    def revalidated(self, url: str):
+        self.touch(normalize_url(url))
+
+SKIPPED_TAGS = {'script', 'style', 'img', 'input', 'nav', 'footer'}
+
+def detect_encoding(content: bytes, headers=None) -> str:
+    """
+    Guess a document's encoding from its Content-Type header or meta tag.
+    Names Python knows are returned in its canonical spelling, which
+    libxml2 accepts for aliases such as latin-1 that it does not.
+    """
+    content_type = (headers or {}).get('Content-Type', '')
+    match = re.search(r'charset=["\']?([\w-]+)', content_type)
+    if match:
+        encoding = match.group(1)
+    else:
+        match = re.search(rb'charset=["\']?([\w-]+)', content[:4096])
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return encoding
+
+def extract_html(content: bytes, encoding: str = 'utf-8', max_chars: int = None,
+                 chunk_size: int = 64 * 1024):
+    """
+    Extract the title, visible body text and link hrefs from an HTML document
+    in a single streaming pass with lxml, without building a full tree.
+    Parsing stops early once max_chars of text have been collected.
+    Returns a (title, text, hrefs) tuple.
+    """
+    from lxml import etree
+    
+    # lxml refuses to close a parser that was never fed, while an empty
+    # page is just a page without content
+    if not content:
+        return "No title found", "", []
+    
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding,
+                                  remove_comments=True, remove_pis=True)
+    title = None
+    lines = []
+    hrefs = []
+    state = {'chars': 0, 'in_body': False, 'skip_depth': 0}
+    
+    def add_text(text):
+        if text:
+            text = text.strip()
+            if text:
+                lines.append(text)
+                state['chars'] += len(text) + 1
+    
+    def handle_events():
+        nonlocal title
+        for event, element in parser.read_events():
+            tag = element.tag if isinstance(element.tag, str) else ''
+            visible = state['in_body'] and not state['skip_depth']
+            
+            if event == 'start':
+                # Text preceding this element is now complete
+                if visible:
+                    previous = element.getprevious()
+                    add_text(previous.tail if previous is not None else element.getparent().text)
+                if tag == 'body':
+                    state['in_body'] = True
+                elif tag in SKIPPED_TAGS and state['in_body']:
+                    state['skip_depth'] += 1
+                # Links inside skipped elements are dropped, as with the bs4 path
+                if tag == 'a' and element.get('href') and not state['skip_depth']:
+                    hrefs.append(element.get('href'))
+            else:
+                if tag == 'title' and title is None:
+                    title = (element.text or '').strip()
+                # Text after the last child (or the element's only text)
+                if visible:
+                    add_text(element[-1].tail if len(element) else element.text)
+                if tag in SKIPPED_TAGS and state['in_body']:
+                    state['skip_depth'] -= 1
+                elif tag == 'body':
+                    state['in_body'] = False
+                # Children and their text have been consumed; release them
+                del element[:]
+    
+    for offset in range(0, len(content), chunk_size):
+        parser.feed(content[offset:offset + chunk_size])
+        handle_events()
+        if max_chars and state['chars'] >= max_chars:
+            break
+    else:
+        try:
+            parser.close()
+        except etree.XMLSyntaxError as e:
+            # Documents with no elements at all; keep whatever was read
+            logger.debug(f"Ignoring HTML parser error at end of document: {e}")
+        handle_events()
+    
+    text = "\n".join(lines)
+    if max_chars:
+        text = text[:max_chars]
+    return title or "No title found", text, hrefs
 
 class Website:
     """
     A utility class to represent a website that we have scraped with links.
+    Pages are parsed with the streaming lxml extractor when lxml is
+    installed; set extractor to 'bs4' to use BeautifulSoup instead.
     """
     
-    def __init__(self, url: str, timeout: int = 10):
+    extractor = 'lxml'
+    
+    def __init__(self, url: str, timeout: int = 10, pool: HTTPClientPool = None,
+                 cache: ScrapeCache = None, fetch: bool = True, max_chars: int = None,
+                 max_bytes: int = None):
         self.url = url
+        self.pool = pool
+        self.cache = cache
+        self.max_chars = max_chars
+        self.max_bytes = max_bytes
+        self.bytes_fetched = 0
+        self.truncated = False
+        self.elapsed = 0.0
         self.title = ""
         self.text = ""
         self.links = []
         self.images = []
         self.error = None
+        self._stale_page = None
         
+        if fetch:
+            self.load(timeout)
+    
+    def load(self, timeout: int, cache_checked: bool = False):
+        """
+        Scrape the page, recording the time taken and any error. Pass
+        cache_checked when load_from_cache has already missed.
+        """
+        self.pool = self.pool or get_http_pool()
+        start = time.perf_counter()
         try:
-            self.scrape_website(timeout)
+            if cache_checked:
+                self.download(timeout)
+            else:
+                self.scrape_website(timeout)
         except Exception as e:
             self.error = str(e)
-            logger.error(f"Error scraping {url}: {e}")
+            logger.error(f"Error scraping {self.url}: {e}")
+        self.elapsed = time.perf_counter() - start
     
     def scrape_website(self, timeout: int):
         """Scrape website content with error handling"""
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(self.url, headers=headers, timeout=timeout)
+        if self.load_from_cache():
+            return
+        self.download(timeout)
+    
+    def download(self, timeout: int):
+        """Fetch the page, revalidating any stale cache entry, and parse it"""
+        response, content, self.truncated = self.pool.fetch(
+            self.url, timeout=timeout, headers=self.revalidation_headers(),
+            max_bytes=self.max_bytes
+        )
+        self.bytes_fetched = len(content)
+        if self.handle_not_modified(response.status_code):
+            return
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        self.parse(content, response.headers)
+    
+    def load_from_cache(self) -> bool:
+        """Load a fresh cache entry, returning True on a hit"""
+        if self.cache is None:
+            return False
+        cached, fresh = self.cache.lookup(self.url)
+        if cached and cached.get('max_chars') and (
+                not self.max_chars or self.max_chars > cached['max_chars']):
+            # The cached extraction was cut shorter than this page needs
+            return False
+        if cached and fresh:
+            self._load_cached(cached)
+            return True
+        self._stale_page = cached
+        return False
+    
+    def revalidation_headers(self) -> dict:
+        """Conditional GET headers for revalidating a stale cache entry"""
+        headers = {}
+        if self._stale_page:
+            if self._stale_page.get('etag'):
+                headers['If-None-Match'] = self._stale_page['etag']
+            if self._stale_page.get('last_modified'):
+                headers['If-Modified-Since'] = self._stale_page['last_modified']
+        return headers
+    
+    def handle_not_modified(self, status_code: int) -> bool:
+        """Reuse the stale cache entry on a 304 response, returning True if used"""
+        if self._stale_page and status_code == 304:
+            self.cache.revalidated(self.url)
+            self._load_cached(self._stale_page)
+            return True
+        return False
+    
+    def parse(self, content: bytes, headers=None):
+        """Extract title, text and links from an HTML document"""
+        headers = headers or {}
+        
+        if self.extractor == 'lxml':
+            try:
+                self.title, self.text, links = extract_html(
+                    content, detect_encoding(content, headers), self.max_chars
+                )
+            except (ImportError, LookupError):
+                # lxml is missing, or libxml2 does not know the page's charset
+                self.title, self.text, links = self._parse_with_bs4(content)
+        else:
+            self.title, self.text, links = self._parse_with_bs4(content)
+        
+        self.links = [self._normalize_url(link) for link in links if link]
+        
+        if self.cache is not None:
+            self.cache.store(self.url, {
+                'title': self.title,
+                'text': self.text,
+                'links': self.links,
+                'max_chars': self.max_chars,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified')
+            })
+    
+    def _parse_with_bs4(self, content: bytes):
+        """Extract (title, text, hrefs) by building a full BeautifulSoup tree"""
+        from bs4 import BeautifulSoup
+        
+        soup = BeautifulSoup(content, 'html.parser')
         
         # Extract title
-        self.title = soup.title.string.strip() if soup.title else "No title found"
+        title = soup.title.string.strip() if soup.title else "No title found"
         
         # Extract text content
+        text = ""
         if soup.body:
             # Remove irrelevant elements
             for element in soup.body(['script', 'style', 'img', 'input', 'nav', 'footer']):
                 element.decompose()
-            self.text = soup.body.get_text(separator="\n", strip=True)
+            text = soup.body.get_text(separator="\n", strip=True)
+        if self.max_chars:
+            text = text[:self.max_chars]
         
         # Extract links
         links = [link.get('href') for link in soup.find_all('a')]
-        self.links = [self._normalize_url(link) for link in links if link]
+        return title, text, links
+    
+    def _load_cached(self, page: dict):
+        """Populate this page from a cache entry without re-parsing"""
+        self.title = page['title']
+        self.text = page['text']
+        self.links = page['links']
     
     def _normalize_url(self, url: str):
         """Convert relative URLs to absolute URLs"""
@@ -92,15 +631,1060 @@ class Website:
     def is_valid(self):
         return self.error is None
 
-class BrochureGenerator:
+class ScrapeMetrics:
     """
-    Main class for generating AI-powered marketing brochures
+    Counters comparing how much was downloaded for a job with how much of
+    it ended up in the prompt context.
     """
     
-    def __init__(self, api_key, model):
-        # Validate API key
-        if not validate_api_key(api_key):
-            raise ValueError("Invalid OpenAI API key format")
+    def __init__(self):
+        self.pages_fetched = 0
+        self.pages_truncated = 0
+        self.pages_skipped = 0
+        self.bytes_fetched = 0
+        self.chars_extracted = 0
+        self.chars_used = 0
+        self.bytes_used = 0
+        self.tokens_collected = 0
+        self.tokens_used = 0
+        self.lines_deduplicated = 0
+        self.tokens_deduplicated = 0
+        self.pages_prefetched = 0
+        self.prefetch_hits = 0
+    
+    def add_page(self, website: Website):
+        self.pages_fetched += 1
+        self.pages_truncated += int(website.truncated)
+        self.bytes_fetched += website.bytes_fetched
+        self.chars_extracted += len(website.text)
+    
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+def _otel_tracer():
+    """Return an OpenTelemetry tracer when the API is installed, else None"""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer(__name__)
+
+class StageTracer:
+    """
+    Records timed pipeline stages (landing fetch, link selection, subpage
+    fetches, prompt build, first token, generation) for one brochure job.
+    Each finished stage is logged as a structured span, exported to
+    OpenTelemetry when it is installed, and passed to the listeners, which
+    the UI uses to drive its progress bar.
+    """
+    
+    def __init__(self, listeners=None, job: str = None):
+        self.listeners = list(listeners or [])
+        self.job = job
+        self.spans = []
+        self.trace_id = hashlib.sha256(f"{job}:{time.time_ns()}".encode('utf-8')).hexdigest()[:32]
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.otel = _otel_tracer()
+        self._lock = threading.Lock()
+    
+    def emit(self, stage: str, duration: float = 0.0, start: float = None, **attributes):
+        """Record a finished stage that started at start (perf_counter) and took duration seconds"""
+        start = start if start is not None else time.perf_counter() - duration
+        span = {
+            'trace_id': self.trace_id,
+            'name': stage,
+            'job': self.job,
+            'start_ms': round((start - self.started) * 1000, 1),
+            'duration_ms': round(duration * 1000, 1),
+            'attributes': attributes,
+        }
+        with self._lock:
+            self.spans.append(span)
+        logger.info(f"Stage {stage}: {json.dumps(span, default=str)}")
+        
+        if self.otel is not None:
+            start_ns = self.started_ns + int((start - self.started) * 1e9)
+            otel_span = self.otel.start_span(stage, start_time=start_ns, attributes={
+                key: value for key, value in attributes.items()
+                if isinstance(value, (str, bool, int, float))
+            })
+            otel_span.end(end_time=start_ns + int(duration * 1e9))
+        
+        for listener in self.listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                logger.error(f"Error in stage listener: {e}")
+        return span
+    
+    @contextmanager
+    def span(self, stage: str, **attributes):
+        """Time the enclosed block; attributes added to the yielded dict are recorded"""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.emit(stage, time.perf_counter() - start, start, **attributes)
+    
+    def trace_pages(self, linked_pages, total: int):
+        """Yield (link, page) pairs, recording a subpage_fetch stage for each"""
+        pages = iter(linked_pages)
+        index = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                link, website = next(pages)
+            except StopIteration:
+                return
+            index += 1
+            self.record_page(link, website, index, total, start)
+            yield link, website
+    
+    def record_page(self, link: dict, website: Website, index: int, total: int, start: float):
+        """Record a subpage_fetch stage; its duration is how long the job waited for the page"""
+        self.emit('subpage_fetch', time.perf_counter() - start, start,
+                  **self.page_attributes(link, website, index, total))
+    
+    @staticmethod
+    def page_attributes(link: dict, website: Website, index: int, total: int) -> dict:
+        """Attributes of a subpage_fetch stage"""
+        return {
+            'url': website.url, 'type': link.get('type', ''), 'ok': website.is_valid(),
+            'bytes': website.bytes_fetched, 'fetch_ms': round(website.elapsed * 1000, 1),
+            'index': index, 'total': total
+        }
+    
+    def generation(self, counter, **attributes):
+        """Start timing a model response; feed it chunks and finish() it"""
+        return GenerationTimer(self, counter, **attributes)
+    
+    def durations(self) -> dict:
+        """Total seconds spent per stage"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span['name']] = totals.get(span['name'], 0.0) + span['duration_ms'] / 1000
+        return totals
+
+class GenerationTimer:
+    """
+    Measures time to first token and tokens per second for one streamed
+    model response.
+    """
+    
+    def __init__(self, tracer: StageTracer, counter, **attributes):
+        self.tracer = tracer
+        self.counter = counter
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.parts = []
+    
+    def chunk(self, text: str):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            self.tracer.emit('first_token', self.first_token - self.start, self.start, **self.attributes)
+        self.parts.append(text)
+    
+    def finish(self):
+        end = time.perf_counter()
+        tokens = self.counter.count("".join(self.parts))
+        streaming = end - self.first_token if self.first_token is not None else 0.0
+        return self.tracer.emit(
+            'generation', end - self.start, self.start,
+            chunks=len(self.parts), tokens=tokens,
+            tokens_per_second=round(tokens / streaming, 1) if streaming > 0 else 0.0,
+            **self.attributes
+        )
+
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+class TokenCounter:
+    """
+    Counts and truncates text by model tokens with tiktoken. If tiktoken
+    is missing or cannot load its encoding (it downloads the encoding file
+    on first use), falls back to a local estimate that counts each CJK
+    character as one token and other text as roughly four characters per
+    token.
+    """
+    
+    def __init__(self, model: str = MODEL):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('o200k_base')
+        except ImportError:
+            logger.warning("tiktoken is not installed; estimating token counts")
+        except Exception as e:
+            logger.warning(f"Could not load the tiktoken encoding, estimating token counts: {e}")
+    
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        cjk = len(CJK_PATTERN.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, preferring a line boundary"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            cut = self.encoding.decode(tokens[:max_tokens])
+        else:
+            # Binary search for the longest prefix within the budget
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.count(text[:middle]) <= max_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            cut = text[:low]
+        
+        line_end = cut.rfind("\n")
+        if line_end > len(cut) * 0.8:
+            cut = cut[:line_end]
+        return cut
+
+# Relative share of the token budget given to each page type
+PAGE_TYPE_WEIGHTS = [
+    (('about', 'company', 'overview', 'mission', 'team'), 2.0),
+    (('product', 'service', 'solution', 'platform', 'pricing'), 2.0),
+    (('customer', 'case stud', 'client', 'testimonial'), 1.5),
+    (('career', 'job', 'join'), 1.0),
+    (('contact',), 1.0),
+]
+LANDING_PAGE_WEIGHT = 3.0
+
+class PageSection:
+    """
+    One scraped page destined for the prompt, labelled with its page type.
+    """
+    
+    def __init__(self, label: str, title: str, text: str, landing: bool = False):
+        self.label = label
+        self.title = title
+        self.text = text
+        self.landing = landing
+    
+    @classmethod
+    def from_website(cls, label: str, website: Website, landing: bool = False):
+        return cls(label, website.title, website.text, landing=landing)
+    
+    @property
+    def weight(self) -> float:
+        if self.landing:
+            return LANDING_PAGE_WEIGHT
+        label = self.label.lower()
+        for keywords, weight in PAGE_TYPE_WEIGHTS:
+            if any(keyword in label for keyword in keywords):
+                return weight
+        return 0.5
+    
+    def render(self, text: str = None) -> str:
+        text = self.text if text is None else text
+        return f"{self.label}:\nWebpage Title:\n{self.title}\nWebpage Contents:\n{text}\n\n"
+
+class BoilerplateDeduplicator:
+    """
+    Drops paragraphs that repeat across the pages of one job, such as shared
+    headers, footer-like blocks and calls to action. Exact repeats are
+    caught by hashing normalized lines; near-duplicates of longer lines are
+    caught with 64-bit SimHash fingerprints over word shingles. The first
+    occurrence (usually on the landing page) is kept.
+    """
+    
+    def __init__(self, shingle_size: int = 2, min_words: int = 8, max_distance: int = 7,
+                 counter: TokenCounter = None):
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.max_distance = max_distance
+        self.counter = counter or TokenCounter()
+        # Fingerprints within max_distance bits of each other must share at
+        # least one of max_distance + 1 bands
+        self.band_count = max_distance + 1
+        self.band_bits = 64 // self.band_count
+    
+    @staticmethod
+    def _hash64(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+    
+    def simhash(self, words) -> int:
+        size = self.shingle_size
+        shingles = [' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))]
+        totals = [0] * 64
+        for shingle in shingles:
+            value = self._hash64(shingle)
+            for bit in range(64):
+                totals[bit] += 1 if value >> bit & 1 else -1
+        return sum(1 << bit for bit in range(64) if totals[bit] > 0)
+    
+    def dedupe(self, sections, metrics: ScrapeMetrics = None):
+        """Return the sections with repeated lines removed"""
+        seen_lines = set()
+        bands = [{} for _ in range(self.band_count)]
+        band_mask = (1 << self.band_bits) - 1
+        removed = []
+        deduplicated = []
+        
+        for section in sections:
+            kept = []
+            for line in section.text.split("\n"):
+                normalized = ' '.join(line.lower().split())
+                if not normalized:
+                    continue
+                if normalized in seen_lines:
+                    removed.append(line)
+                    continue
+                seen_lines.add(normalized)
+                
+                words = normalized.split()
+                if len(words) >= self.min_words:
+                    fingerprint = self.simhash(words)
+                    keys = [(fingerprint >> (self.band_bits * band)) & band_mask
+                            for band in range(self.band_count)]
+                    candidates = {
+                        candidate
+                        for band, key in enumerate(keys)
+                        for candidate in bands[band].get(key, ())
+                    }
+                    if any(bin(fingerprint ^ candidate).count('1') <= self.max_distance
+                           for candidate in candidates):
+                        removed.append(line)
+                        continue
+                    for band, key in enumerate(keys):
+                        bands[band].setdefault(key, []).append(fingerprint)
+                
+                kept.append(line)
+            deduplicated.append(PageSection(section.label, section.title, "\n".join(kept),
+                                            landing=section.landing))
+        
+        if metrics is not None and removed:
+            metrics.lines_deduplicated += len(removed)
+            metrics.tokens_deduplicated += self.counter.count("\n".join(removed))
+        return deduplicated
+
+class ContextPacker:
+    """
+    Packs page sections into a target token budget. Each section gets a
+    share of the budget weighted by its page type; sections that need less
+    than their share give the rest back to the others, so every page type
+    stays represented instead of later pages being cut off.
+    """
+    
+    def __init__(self, target_tokens: int = 6000, counter: TokenCounter = None,
+                 min_section_tokens: int = 80):
+        self.target_tokens = target_tokens
+        self.counter = counter or TokenCounter()
+        self.min_section_tokens = min_section_tokens
+    
+    def allocate(self, sections, sizes):
+        """Weighted water-filling of the token budget across sections"""
+        budgets = [0] * len(sections)
+        active = list(range(len(sections)))
+        
+        # Drop the lowest-weight, latest sections if they cannot get a useful share
+        while active and len(active) * self.min_section_tokens > self.target_tokens:
+            active.remove(min(active, key=lambda i: (sections[i].weight, -i)))
+        
+        remaining = self.target_tokens
+        while active:
+            total_weight = sum(sections[i].weight for i in active)
+            satisfied = [
+                i for i in active
+                if sizes[i] <= remaining * sections[i].weight / total_weight
+            ]
+            if not satisfied:
+                for i in active:
+                    budgets[i] = int(remaining * sections[i].weight / total_weight)
+                break
+            for i in satisfied:
+                budgets[i] = sizes[i]
+                remaining -= sizes[i]
+                active.remove(i)
+        return budgets
+    
+    def pack(self, sections, metrics: ScrapeMetrics = None) -> str:
+        """Render sections in order, each trimmed to its share of the budget"""
+        # Each section's size includes its label and title header
+        overheads = [self.counter.count(section.render("")) for section in sections]
+        sizes = [self.counter.count(section.text) + overhead
+                 for section, overhead in zip(sections, overheads)]
+        budgets = self.allocate(sections, sizes)
+        
+        rendered = []
+        for section, size, budget, overhead in zip(sections, sizes, budgets, overheads):
+            if budget <= overhead:
+                continue
+            text = section.text
+            if budget < size:
+                text = self.counter.truncate(text, budget - overhead)
+            rendered.append(section.render(text))
+        
+        result = "\n\n".join(rendered)
+        if metrics is not None:
+            metrics.tokens_collected = sum(sizes)
+            metrics.tokens_used = self.counter.count(result)
+        return result
+
+SOCIAL_DOMAINS = {
+    'facebook.com', 'twitter.com', 'x.com', 'linkedin.com', 'instagram.com',
+    'youtube.com', 'tiktok.com', 'pinterest.com', 'github.com', 'medium.com'
+}
+# Path segments (matched whole, ignoring a file extension) of pages that
+# never belong in a brochure
+EXCLUDED_PATH_SEGMENTS = {
+    'privacy', 'privacy-policy', 'privacy-notice', 'privacy-statement', 'terms',
+    'terms-of-service', 'terms-of-use', 'terms-and-conditions', 'tos', 'cookies',
+    'cookie-policy', 'legal', 'legal-notice', 'login', 'log-in', 'logout', 'signin',
+    'sign-in', 'signup', 'sign-up', 'register', 'cart', 'checkout', 'account',
+    'my-account', 'search', 'tag', 'tags'
+}
+# WordPress internals such as /wp-admin and /wp-content
+EXCLUDED_SEGMENT_PREFIXES = ('wp-',)
+EXCLUDED_EXTENSIONS = (
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.xml',
+    '.css', '.js', '.json', '.mp4', '.mp3'
+)
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'ref'}
+TRACKING_PARAM_PREFIXES = ('utm_', 'mc_')
+
+# Page types and the path segments that identify them
+PAGE_TYPE_KEYWORDS = [
+    ('about page', ('about', 'about-us', 'company', 'who-we-are', 'our-story', 'mission', 'team', 'leadership')),
+    ('products page', ('products', 'product', 'platform', 'features')),
+    ('services page', ('services', 'service', 'solutions', 'what-we-do')),
+    ('customers page', ('customers', 'case-studies', 'clients', 'success-stories', 'testimonials')),
+    ('careers page', ('careers', 'career', 'jobs', 'join-us', 'work-with-us')),
+    ('contact page', ('contact', 'contact-us', 'locations')),
+]
+
+class LinkRanker:
+    """
+    Local index and scorer for a page's links. Canonicalizes and dedupes
+    URLs, keeps only same-site pages, and scores paths by page-type
+    keywords. When the top picks confidently cover the key page types the
+    link-selection LLM call can be skipped; otherwise a short, ranked
+    candidate list is sent to the model instead of the first 50 raw links.
+    """
+    
+    def __init__(self, max_candidates: int = 25, min_score: float = 2.0,
+                 confident_types: int = 3):
+        self.max_candidates = max_candidates
+        self.min_score = min_score
+        self.confident_types = confident_types
+    
+    @staticmethod
+    def site_domain(url: str) -> str:
+        host = (urlparse(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+    
+    @staticmethod
+    def is_tracking_param(pair: str) -> bool:
+        name = pair.split('=', 1)[0].lower()
+        return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+    
+    @staticmethod
+    def segment_names(path: str):
+        """A path's non-empty segments without file extensions, so /about.php reads as about"""
+        return [segment.rsplit('.', 1)[0] for segment in path.lower().split('/') if segment]
+    
+    def canonicalize(self, url: str) -> str:
+        """Normalize a URL and strip fragments and tracking parameters"""
+        parts = urlparse(url)
+        query = '&'.join(
+            pair for pair in parts.query.split('&')
+            if pair and not self.is_tracking_param(pair)
+        )
+        return normalize_url(urlunparse(parts._replace(query=query, fragment='')))
+    
+    def is_candidate(self, url: str, domain: str) -> bool:
+        parts = urlparse(url)
+        if parts.scheme not in ('http', 'https'):
+            return False
+        host = self.site_domain(url)
+        if host in SOCIAL_DOMAINS or any(host.endswith('.' + social) for social in SOCIAL_DOMAINS):
+            return False
+        if host != domain and not host.endswith('.' + domain):
+            return False
+        path = parts.path.lower()
+        if path.endswith(EXCLUDED_EXTENSIONS):
+            return False
+        for name in self.segment_names(path):
+            if name in EXCLUDED_PATH_SEGMENTS or name.startswith(EXCLUDED_SEGMENT_PREFIXES):
+                return False
+        return True
+    
+    def score(self, url: str):
+        """Return (score, page type) for a URL based on its path segments"""
+        segments = self.segment_names(urlparse(url).path)
+        best_score, best_type = 0.0, None
+        for page_type, keywords in PAGE_TYPE_KEYWORDS:
+            for position, segment in enumerate(segments):
+                if segment in keywords:
+                    score = 3.0 if position == 0 else 2.0
+                elif any(keyword in segment for keyword in keywords):
+                    score = 1.0
+                else:
+                    continue
+                if score > best_score:
+                    best_score, best_type = score, page_type
+        if best_type:
+            # Prefer shallow pages such as /about over /about/team/jane-doe
+            best_score -= 0.5 * (len(segments) - 1)
+        return best_score, best_type
+    
+    def rank(self, page_url: str, links):
+        """Return deduped same-site links as (score, page type, url), best first"""
+        domain = self.site_domain(page_url)
+        seen = {self.canonicalize(page_url).replace('://www.', '://', 1)}
+        ranked = []
+        for position, link in enumerate(links):
+            url = self.canonicalize(link)
+            # www.example.com and example.com serve the same page
+            key = url.replace('://www.', '://', 1)
+            if key in seen or not self.is_candidate(url, domain):
+                continue
+            seen.add(key)
+            score, page_type = self.score(url)
+            ranked.append((score, page_type, position, url))
+        ranked.sort(key=lambda item: (-item[0], item[2]))
+        return [(score, page_type, url) for score, page_type, _, url in ranked]
+    
+    def select(self, page_url: str, links):
+        """
+        Return (picks, candidates). picks is a confident heuristic link
+        selection, or empty when the model should decide among candidates.
+        """
+        ranked = self.rank(page_url, links)
+        
+        picks = {}
+        for score, page_type, url in ranked:
+            if page_type and score >= self.min_score and page_type not in picks:
+                picks[page_type] = {'type': page_type, 'url': url}
+        
+        candidates = [url for _, _, url in ranked[:self.max_candidates]]
+        if 'about page' in picks and len(picks) >= self.confident_types:
+            return list(picks.values()), candidates
+        return [], candidates
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to rate limit requests to a single host.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available and consume it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class FetchEngine:
+    """
+    Scrapes many pages concurrently using a bounded thread pool, with
+    per-host concurrency limits and token-bucket rate limiting.
+    """
+    
+    def __init__(self, max_workers: int = 8, per_host_limit: int = 4,
+                 rate: float = 5.0, burst: int = 5, timeout: int = 10,
+                 pool: HTTPClientPool = None, cache: ScrapeCache = None,
+                 max_page_bytes: int = 2_000_000, max_page_chars: int = 25000):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.pool = pool or get_http_pool()
+        self.cache = cache
+        self.max_page_bytes = max_page_bytes
+        self.max_page_chars = max_page_chars
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+    
+    def _host_limits(self, url: str):
+        """Return the (semaphore, token bucket) pair for the URL's host"""
+        host = urlparse(url).netloc.lower()
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    threading.BoundedSemaphore(self.per_host_limit),
+                    TokenBucket(self.rate, self.burst)
+                )
+            return self._hosts[host]
+    
+    def fetch(self, url: str, landing: bool = False, stop: threading.Event = None):
+        """
+        Scrape a single page, respecting the host's limits. Landing pages
+        are not cut to the per-page character budget, so all of their
+        links are kept. Fresh cache hits are returned without waiting on
+        the host's limits. If stop is set by the time the limits let the
+        request through, the page is skipped without being downloaded.
+        """
+        website = Website(url, timeout=self.timeout, pool=self.pool, cache=self.cache, fetch=False,
+                          max_chars=None if landing else self.max_page_chars,
+                          max_bytes=self.max_page_bytes)
+        if website.load_from_cache():
+            return website
+        
+        semaphore, bucket = self._host_limits(url)
+        with semaphore:
+            bucket.acquire()
+            if stop is not None and stop.is_set():
+                website.error = "Skipped: no more pages were needed"
+                return website
+            website.load(self.timeout, cache_checked=True)
+        return website
+    
+    def prefetch(self, urls, max_workers: int = 2):
+        """
+        Start scraping likely pages in the background with at most
+        max_workers concurrent requests. Returns {normalized url: future}
+        for iter_fetch to reuse; the caller cancels whatever it does not use.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        prefetched = {normalize_url(url): executor.submit(self.fetch, url) for url in urls}
+        executor.shutdown(wait=False)
+        return prefetched
+    
+    def iter_fetch(self, urls, prefetched: dict = None, stop: threading.Event = None):
+        """
+        Scrape pages concurrently and yield them in the same order as urls,
+        reusing any matching prefetched pages. Pages not yet downloaded
+        are skipped once the consumer stops early, or once the caller sets
+        stop; stop is set when the iteration ends.
+        """
+        urls = list(urls)
+        if not urls:
+            return
+        prefetched = prefetched if prefetched is not None else {}
+        
+        # The pages of one job mostly share a host, so no more fetches are
+        # scheduled than the host lets run at once. Fetches still waiting
+        # on the host's limits when the consumer stops see the stop event
+        # and skip their download.
+        window = min(self.max_workers, self.per_host_limit)
+        stop = stop if stop is not None else threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(window, len(urls)))
+        pending = deque()
+        next_index = 0
+        try:
+            while next_index < len(urls) or pending:
+                while next_index < len(urls) and len(pending) < window:
+                    url = urls[next_index]
+                    future = prefetched.pop(normalize_url(url), None)
+                    pending.append(future or executor.submit(self.fetch, url, False, stop))
+                    next_index += 1
+                yield pending.popleft().result()
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+class AsyncTokenBucket:
+    """
+    Token bucket for rate limiting coroutines on a single event loop.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    async def acquire(self):
+        """Wait until a token is available and consume it"""
+        import asyncio
+        
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncFetchEngine:
+    """
+    Async counterpart of FetchEngine, scraping pages over a shared
+    httpx.AsyncClient with per-host concurrency and rate limits.
+    """
+    
+    def __init__(self, max_connections: int = 20, per_host_limit: int = 4,
+                 rate: float = 5.0, burst: int = 5, timeout: int = 10,
+                 cache: ScrapeCache = None, http2: bool = False,
+                 max_page_bytes: int = 2_000_000, max_page_chars: int = 25000):
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.cache = cache
+        self.http2 = http2 and HTTPClientPool._http2_available()
+        self.max_page_bytes = max_page_bytes
+        self.max_page_chars = max_page_chars
+        self._client = None
+        self._hosts = {}
+    
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                headers={'User-Agent': USER_AGENT, 'Accept-Encoding': _supported_encodings()},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                http2=self.http2,
+                follow_redirects=True,
+                timeout=self.timeout
+            )
+        return self._client
+    
+    def _host_limits(self, url: str):
+        """Return the (semaphore, token bucket) pair for the URL's host"""
+        import asyncio
+        
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = (
+                asyncio.Semaphore(self.per_host_limit),
+                AsyncTokenBucket(self.rate, self.burst)
+            )
+        return self._hosts[host]
+    
+    async def fetch(self, url: str, landing: bool = False) -> Website:
+        """Scrape a single page, respecting the host's limits"""
+        import asyncio
+        
+        website = Website(url, cache=self.cache, fetch=False,
+                          max_chars=None if landing else self.max_page_chars,
+                          max_bytes=self.max_page_bytes)
+        try:
+            if website.load_from_cache():
+                return website
+            
+            semaphore, bucket = self._host_limits(url)
+            async with semaphore:
+                await bucket.acquire()
+                chunks = []
+                async with self.client.stream(
+                    'GET', url, headers=website.revalidation_headers()
+                ) as response:
+                    async for chunk in response.aiter_bytes():
+                        chunks.append(chunk)
+                        website.bytes_fetched += len(chunk)
+                        if self.max_page_bytes and website.bytes_fetched >= self.max_page_bytes:
+                            website.truncated = True
+                            break
+            
+            content = b''.join(chunks)[:self.max_page_bytes]
+            website.bytes_fetched = len(content)
+            if website.handle_not_modified(response.status_code):
+                return website
+            response.raise_for_status()
+            
+            # Parse off the event loop so other coroutines keep running
+            await asyncio.to_thread(website.parse, content, response.headers)
+        except Exception as e:
+            website.error = str(e)
+            logger.error(f"Error scraping {url}: {e}")
+        return website
+    
+    def prefetch(self, urls, max_workers: int = 2):
+        """
+        Start scraping likely pages in the background with at most
+        max_workers concurrent requests. Returns {normalized url: task} for
+        iter_fetch to reuse; the caller cancels whatever it does not use.
+        """
+        import asyncio
+        
+        semaphore = asyncio.Semaphore(max_workers)
+        
+        async def fetch(url):
+            async with semaphore:
+                return await self.fetch(url)
+        
+        return {normalize_url(url): asyncio.create_task(fetch(url)) for url in urls}
+    
+    async def iter_fetch(self, urls, prefetched: dict = None):
+        """
+        Scrape pages concurrently and yield them in the same order as urls,
+        reusing any matching prefetched pages. Pages not yet fetched are
+        cancelled if the consumer stops early.
+        """
+        import asyncio
+        
+        prefetched = prefetched if prefetched is not None else {}
+        tasks = [
+            prefetched.pop(normalize_url(url), None) or asyncio.create_task(self.fetch(url))
+            for url in urls
+        ]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def fetch_all(self, urls):
+        """Scrape pages concurrently and return them in the same order as urls"""
+        import asyncio
+        
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+BROCHURE_SECTIONS = [
+    "Company name and tagline",
+    "About/Overview section",
+    "Products/Services",
+    "Company culture and values",
+    "Customer focus",
+    "Career opportunities (if available)",
+    "Contact information",
+]
+
+# Progressive generation phases: the brochure sections written in each phase
+# and the page types they wait for. The first phase uses only the landing
+# page and the last waits for every page.
+PROGRESSIVE_PHASES = [
+    ((1, 2), ()),
+    ((3, 4, 5), ('about', 'company', 'product', 'service', 'solution', 'platform',
+                 'customer', 'client', 'case stud', 'mission', 'team', 'value', 'culture')),
+    ((6, 7), None),
+]
+
+def phase_ready(links, pages, done: bool, keywords) -> bool:
+    """
+    Whether a progressive phase can start: every selected link whose type
+    matches keywords has its page among pages, or no more pages will come.
+    keywords None waits for every page.
+    """
+    if done:
+        return True
+    if links is None or keywords is None:
+        return False
+    return all(
+        index < len(pages) for index, link in enumerate(links)
+        if any(keyword in link.get('type', '').lower() for keyword in keywords)
+    )
+
+class ProgressiveScrape:
+    """
+    Selects and fetches a job's linked pages on a background thread, so
+    brochure sections can be generated as their source pages arrive.
+    Its link_selection and subpage_fetch stages are queued and only sent
+    to the tracer by emit_spans, on the consumer's thread, so stage
+    listeners never run on the background thread. cancel stops it between
+    steps once the consumer no longer needs its pages.
+    """
+    
+    def __init__(self, generator, main_website: Website, tracer: StageTracer):
+        self.generator = generator
+        self.main_website = main_website
+        self.tracer = tracer
+        self.links = None
+        self.pages = []
+        self.done = False
+        self.queued_spans = []
+        self.condition = threading.Condition()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        generator = self.generator
+        guesses, prefetched = generator.prompts.start_prefetch(
+            self.main_website, generator.fetch_engine, generator.prefetch_workers
+        )
+        try:
+            if self.stop.is_set():
+                return
+            start = time.perf_counter()
+            links = generator.prompts.select_links(generator.get_relevant_links(self.main_website))
+            with self.condition:
+                self.links = links
+                self.queued_spans.append(('link_selection', time.perf_counter() - start, start,
+                                          {'links': len(links)}))
+                self.condition.notify_all()
+            if self.stop.is_set():
+                return
+            
+            chars = len(self.main_website.text)
+            bytes_fetched = self.main_website.bytes_fetched
+            pages = generator.fetch_engine.iter_fetch(
+                (link['url'] for link in links), prefetched, stop=self.stop
+            )
+            try:
+                start = time.perf_counter()
+                for link, website in zip(links, pages):
+                    if self.stop.is_set():
+                        break
+                    with self.condition:
+                        self.pages.append((link, website))
+                        self.queued_spans.append((
+                            'subpage_fetch', time.perf_counter() - start, start,
+                            StageTracer.page_attributes(link, website, len(self.pages), len(links))
+                        ))
+                        self.condition.notify_all()
+                    start = time.perf_counter()
+                    chars += len(website.text)
+                    bytes_fetched += website.bytes_fetched
+                    if generator.prompts.context_full(chars, bytes_fetched):
+                        break
+            finally:
+                pages.close()
+        except Exception as e:
+            logger.error(f"Error collecting pages for {self.main_website.url}: {e}")
+        finally:
+            for future in prefetched.values():
+                future.cancel()
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+    
+    def wait_for(self, keywords=None):
+        """
+        Block until every selected page whose type matches keywords has
+        arrived (or every page, when keywords is None), then return the
+        (link, page) pairs received so far.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: phase_ready(self.links, self.pages, self.done, keywords))
+            return list(self.pages)
+    
+    def cancel(self):
+        """Stop selecting and fetching pages; downloads already running finish"""
+        self.stop.set()
+    
+    def emit_spans(self):
+        """Send the stages finished so far to the tracer; call on the consumer's thread"""
+        with self.condition:
+            spans, self.queued_spans = self.queued_spans, []
+        for stage, duration, start, attributes in spans:
+            self.tracer.emit(stage, duration, start, **attributes)
+
+class AsyncProgressiveScrape:
+    """
+    Async counterpart of ProgressiveScrape, selecting and fetching a job's
+    linked pages in a task on the running event loop. The task runs on the
+    consumer's thread, so it records its stages on the tracer directly.
+    """
+    
+    def __init__(self, generator, main_website: Website, tracer: StageTracer):
+        import asyncio
+        
+        self.generator = generator
+        self.main_website = main_website
+        self.tracer = tracer
+        self.links = None
+        self.pages = []
+        self.done = False
+        self.condition = asyncio.Condition()
+        self.task = asyncio.create_task(self._run())
+    
+    async def _notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+    
+    async def _run(self):
+        generator = self.generator
+        guesses, prefetched = generator.prompts.start_prefetch(
+            self.main_website, generator.fetch_engine, generator.prefetch_workers
+        )
+        try:
+            with self.tracer.span('link_selection') as span:
+                self.links = links = generator.prompts.select_links(
+                    await generator.get_relevant_links(self.main_website)
+                )
+                span['links'] = len(links)
+            await self._notify()
+            
+            chars = len(self.main_website.text)
+            bytes_fetched = self.main_website.bytes_fetched
+            pages = generator.fetch_engine.iter_fetch((link['url'] for link in links), prefetched)
+            try:
+                start = time.perf_counter()
+                async for website in pages:
+                    link = links[len(self.pages)]
+                    self.pages.append((link, website))
+                    self.tracer.record_page(link, website, len(self.pages), len(links), start)
+                    start = time.perf_counter()
+                    await self._notify()
+                    chars += len(website.text)
+                    bytes_fetched += website.bytes_fetched
+                    if generator.prompts.context_full(chars, bytes_fetched):
+                        break
+            finally:
+                await pages.aclose()
+        except Exception as e:
+            logger.error(f"Error collecting pages for {self.main_website.url}: {e}")
+        finally:
+            for task in prefetched.values():
+                task.cancel()
+            self.done = True
+            await self._notify()
+    
+    async def wait_for(self, keywords=None):
+        """
+        Wait until every selected page whose type matches keywords has
+        arrived (or every page, when keywords is None), then return the
+        (link, page) pairs received so far.
+        """
+        async with self.condition:
+            await self.condition.wait_for(lambda: phase_ready(self.links, self.pages, self.done, keywords))
+            return list(self.pages)
+    
+    def cancel(self):
+        self.task.cancel()
+
+class BrochurePrompts:
+    """
+    Prompt assembly, link ranking, context packing and completion caching
+    shared by BrochureGenerator and AsyncBrochureGenerator, so both send
+    identical prompts. It makes no network calls of its own; start_prefetch
+    hands its guesses to the caller's fetch engine.
+    """
+    
+    def __init__(self, link_cache: TieredCache = None, max_context_chars: int = 100_000,
+                 max_job_bytes: int = 10_000_000, context_packer: ContextPacker = None,
+                 deduplicator: BoilerplateDeduplicator = None, link_ranker: LinkRanker = None,
+                 prefetch_limit: int = 4, completion_cache: TieredCache = None):
+        self.link_cache = link_cache if link_cache is not None else TieredCache()
+        self.max_context_chars = max_context_chars
+        self.max_job_bytes = max_job_bytes
+        self.context_packer = context_packer or ContextPacker()
+        self.deduplicator = deduplicator or BoilerplateDeduplicator(counter=self.context_packer.counter)
+        self.link_ranker = link_ranker or LinkRanker()
+        self.prefetch_limit = prefetch_limit
+        # Optional; brochure completions are only cached when one is given
+        self.completion_cache = completion_cache
         
         # Language and tone configurations
         self.languages = {
@@ -124,140 +1708,1088 @@ class BrochureGenerator:
             "Humorous": "humorous and funny"
         }
     
+    @property
+    def counter(self) -> TokenCounter:
+        return self.context_packer.counter
+    
     def link_system_prompt(self):
         return """You are provided with a list of links on a webpage. 
         You are able to decide which of the links would be most relevant to include in a brochure about the company 
         such as links to an About page, Company page, Services, Products, or Careers/Jobs pages.
         
-        You should respond in JSON as in the example:
-        {
-            "links": [
-                {"type": "about page", "url": "https://full.url/goes/here/about"},
-                {"type": "careers page", "url": "https://another.full.url/careers"},
-                {"type": "services page", "url": "https://example.com/services"}
-            ]
+        You should respond in JSON as in the example:
+        {
+            "links": [
+                {"type": "about page", "url": "https://full.url/goes/here/about"},
+                {"type": "careers page", "url": "https://another.full.url/careers"},
+                {"type": "services page", "url": "https://example.com/services"}
+            ]
+        }
+        """
+    
+    def links_user_prompt(self, website: Website, candidates=None):
+        prompt = f"""Here is the list of links from the website {website.url} - 
+        please decide which of these are relevant web links for a brochure about the company.
+        Respond with the full https URL in JSON format. 
+        Do not include Terms of Service, Privacy Policy, email links, or social media links.
+        
+        Links:
+        """
+        prompt += "\n".join(candidates if candidates is not None else website.links[:50])
+        return prompt
+    
+    def link_cache_key(self, website: Website, candidates=None):
+        """Content-addressed key for the link selection of a page"""
+        links = candidates if candidates is not None else website.links[:50]
+        links = sorted({normalize_url(link) for link in links})
+        return TieredCache.make_key(MODEL, self.link_system_prompt(), links)
+    
+    def link_messages(self, website: Website, candidates=None):
+        return [
+            {'role': 'system', 'content': self.link_system_prompt()},
+            {'role': 'user', 'content': self.links_user_prompt(website, candidates)}
+        ]
+    
+    def rank_links(self, website: Website):
+        """
+        Rank the page's links locally. Returns (picks, candidates); picks is
+        non-empty when the heuristic is confident enough to skip the model.
+        """
+        picks, candidates = self.link_ranker.select(website.url, website.links)
+        if picks:
+            logger.info(f"Selected {len(picks)} links heuristically for {website.url}")
+        return picks, candidates
+    
+    def parse_link_response(self, content: str, cache_key: str):
+        """Parse the model's JSON link selection and cache non-empty results"""
+        result = json.loads(content)
+        links = result.get('links', [])
+        if links:
+            self.link_cache.set(cache_key, links)
+        return links
+    
+    def prefetch_guesses(self, website: Website):
+        """
+        Pages worth fetching speculatively while the link-selection call is
+        in flight: the best keyword matches, unless the heuristic is
+        confident enough that no model call will be made
+        """
+        if not self.prefetch_limit:
+            return []
+        picks, _ = self.link_ranker.select(website.url, website.links)
+        if picks:
+            return []
+        ranked = self.link_ranker.rank(website.url, website.links)
+        return [url for score, page_type, url in ranked if page_type][:self.prefetch_limit]
+    
+    def start_prefetch(self, website: Website, fetch_engine, max_workers: int):
+        """
+        Speculatively fetch the likeliest pages with a FetchEngine or
+        AsyncFetchEngine; returns (guesses, prefetched)
+        """
+        guesses = self.prefetch_guesses(website)
+        prefetched = fetch_engine.prefetch(guesses, max_workers) if guesses else {}
+        return guesses, prefetched
+    
+    def record_prefetch(self, prefetched: dict, guesses, metrics: ScrapeMetrics):
+        metrics.pages_prefetched = len(guesses)
+        metrics.prefetch_hits = len(guesses) - len(prefetched)
+    
+    def plan_translations(self, variants):
+        """
+        Split (language, tone) variants for translate-from-master mode.
+        Returns {master: [variants translated from it]}, with one master per
+        tone, in the first language listed for that tone.
+        """
+        masters = {}
+        for language, tone in variants:
+            masters.setdefault(tone, (language, tone))
+        return {
+            master: [variant for variant in variants if variant[1] == tone and variant != master]
+            for tone, master in masters.items()
+        }
+    
+    def select_links(self, relevant_links):
+        """Keep the first 20 well-formed links from the model's selection"""
+        return [
+            link for link in relevant_links[:20]
+            if isinstance(link, dict) and link.get('url')
+        ]
+    
+    def context_full(self, chars: int, bytes_fetched: int) -> bool:
+        """
+        Whether enough raw page text (or bytes) has been collected for the
+        packer to fill its token budget
+        """
+        return chars >= self.max_context_chars or bytes_fetched >= self.max_job_bytes
+    
+    def collect_sections(self, main_website: Website, linked_pages, metrics: ScrapeMetrics):
+        """
+        Turn the landing page and (link, page) pairs into page sections.
+        Stops consuming pages once the job's budget is used up.
+        """
+        metrics.add_page(main_website)
+        sections = [PageSection.from_website("Landing page", main_website, landing=True)]
+        chars = len(main_website.text)
+        
+        linked_pages = iter(linked_pages)
+        while not self.context_full(chars, metrics.bytes_fetched):
+            item = next(linked_pages, None)
+            if item is None:
+                break
+            link, link_website = item
+            metrics.add_page(link_website)
+            if link_website.is_valid():
+                sections.append(PageSection.from_website(link.get('type', 'page'), link_website))
+                chars += len(link_website.text)
+            else:
+                logger.warning(f"Could not scrape {link['url']}: {link_website.error}")
+        return sections
+    
+    def format_details(self, main_website: Website, linked_pages, metrics: ScrapeMetrics = None):
+        """Assemble the landing page and (link, page) pairs into packed prompt context"""
+        metrics = metrics if metrics is not None else ScrapeMetrics()
+        sections = self.collect_sections(main_website, linked_pages, metrics)
+        return self.pack_sections(sections, metrics)
+    
+    def pack_sections(self, sections, metrics: ScrapeMetrics):
+        """Deduplicate boilerplate and pack sections into the prompt context"""
+        sections = self.deduplicator.dedupe(sections, metrics)
+        
+        result = self.context_packer.pack(sections, metrics)
+        metrics.chars_used = len(result)
+        metrics.bytes_used = len(result.encode('utf-8'))
+        return result
+    
+    def log_metrics(self, url, relevant_links, metrics: ScrapeMetrics):
+        metrics.pages_skipped = len(relevant_links) + 1 - metrics.pages_fetched
+        logger.info(f"Scrape metrics for {url}: {json.dumps(metrics.as_dict())}")
+    
+    def get_brochure_system_prompt(self, language, tone):
+        """Generate system prompt for brochure creation"""
+        lang_instruction = f" in {language}" if language != "English" else ""
+        structure = "\n".join(
+            f"        {number}. {section}"
+            for number, section in enumerate(BROCHURE_SECTIONS, start=1)
+        )
+        
+        return f"""You are an expert marketing copywriter that analyzes company website content 
+        and creates compelling brochures for prospective customers, investors, and recruits.
+        
+        Write the brochure{lang_instruction} with a {tone} tone.
+        
+        Structure the brochure with:
+{structure}
+        
+        Use markdown formatting and make it visually appealing and professional.
+        Include specific details from the website content provided.
+        """
+    
+    def get_brochure_user_prompt(self, company_name, website_content):
+        """Generate user prompt for brochure creation"""
+        return f"""Company name: {company_name}
+        
+        Here is the website content to analyze:
+        {website_content}
+        
+        Create a comprehensive marketing brochure based on this information.
+        """
+    
+    def get_translation_system_prompt(self, language, tone):
+        """Generate system prompt for translating a master brochure"""
+        return f"""You are a professional translator of marketing copy.
+        Translate the brochure you are given into {language} ({self.languages.get(language, language)}),
+        keeping its {tone} tone.
+        
+        Preserve the Markdown structure exactly: the same headings and heading levels,
+        lists and their nesting, tables, links, bold and italic text, in the same order,
+        with nothing added or removed. Do not translate URLs, email addresses or product names.
+        Respond with the translated Markdown only.
+        """
+    
+    def get_translation_user_prompt(self, master_brochure):
+        """Generate user prompt for translating a master brochure"""
+        return f"""Here is the brochure to translate:
+        
+{master_brochure}
+        """
+    
+    def get_brochure_section_prompt(self, language, tone, section_numbers, brochure_so_far=""):
+        """
+        Generate system prompt for writing only some sections of the brochure.
+        Once part of it has been written, the model is told to continue it
+        rather than start a new one.
+        """
+        sections = ", ".join(
+            f"{number}. {BROCHURE_SECTIONS[number - 1]}" for number in section_numbers
+        )
+        prompt = self.get_brochure_system_prompt(language, tone) + f"""
+        The brochure is being written progressively, one part at a time.
+        Write ONLY these sections now: {sections}.
+        """
+        if brochure_so_far:
+            prompt += """
+        Continue seamlessly from the brochure written so far. Do not repeat it,
+        and do not restate the company name heading.
+        """
+        if section_numbers[-1] != len(BROCHURE_SECTIONS):
+            prompt += """
+        Do not add a closing summary; later sections follow.
+        """
+        return prompt
+    
+    def get_brochure_continuation_prompt(self, company_name, website_content, brochure_so_far):
+        """Generate user prompt for continuing a progressively written brochure"""
+        prompt = self.get_brochure_user_prompt(company_name, website_content)
+        if brochure_so_far:
+            prompt += f"""
+        Here is the brochure written so far:
+        {brochure_so_far}
+        """
+        return prompt
+    
+    def brochure_messages(self, system_prompt, user_prompt):
+        return [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ]
+    
+    def completion_cache_key(self, system_prompt, user_prompt):
+        """
+        Completion cache key, or None when caching is off. The system prompt
+        carries the language and tone, and the user prompt the packed
+        website content.
+        """
+        if self.completion_cache is None:
+            return None
+        content_hash = hashlib.sha256(user_prompt.encode('utf-8')).hexdigest()
+        return TieredCache.make_key('completion', MODEL, TEMPERATURE, system_prompt, content_hash)
+    
+    def cached_completion(self, cache_key, regenerate=False):
+        """Return the cached completion for the key, unless regeneration is forced"""
+        if cache_key is None or regenerate:
+            return None
+        text = self.completion_cache.get(cache_key)
+        if text is not None:
+            logger.info("Completion cache hit")
+        return text
+    
+    def store_completion(self, cache_key, parts):
+        if cache_key is not None and parts:
+            self.completion_cache.set(cache_key, "".join(parts))
+    
+    @staticmethod
+    def replay_completion(text: str, chunk_size: int = 80):
+        """Yield a cached completion in stream-sized chunks"""
+        for start in range(0, len(text), chunk_size):
+            yield text[start:start + chunk_size]
+
+def openai_http_limits(max_connections: int):
+    """Connection-pool sizing for a generator's OpenAI HTTP client"""
+    import httpx
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+class BrochureGenerator:
+    """
+    Main class for generating AI-powered marketing brochures. Prompt
+    options (link_cache, completion_cache, context_packer and so on) are
+    passed through to its BrochurePrompts.
+    """
+    
+    def __init__(self, api_key, model, fetch_engine: FetchEngine = None,
+                 prompts: BrochurePrompts = None, prefetch_workers: int = 2,
+                 max_connections: int = 20, **prompt_options):
+        # Validate API key
+        if not validate_api_key(api_key):
+            raise ValueError("Invalid OpenAI API key format")
+        
+        self.api_key = api_key
+        self.fetch_engine = fetch_engine or FetchEngine()
+        self.prompts = prompts or BrochurePrompts(**prompt_options)
+        self.prefetch_workers = prefetch_workers
+        self.max_connections = max_connections
+        self._client = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """OpenAI client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key, http_client=httpx.Client(
+                        limits=openai_http_limits(self.max_connections),
+                        timeout=httpx.Timeout(60.0, connect=10.0)
+                    ))
+        return self._client
+    
+    def get_relevant_links(self, website: Website):
+        """Get relevant links using AI"""
+        picks, candidates = self.prompts.rank_links(website)
+        if picks:
+            return picks
+        if not candidates:
+            return []
+        
+        cache_key = self.prompts.link_cache_key(website, candidates)
+        cached = self.prompts.link_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Link selection cache hit for {website.url}")
+            return cached
+        
+        try:
+            response = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self.prompts.link_messages(website, candidates),
+                response_format={'type': 'json_object'},
+                timeout=30
+            )
+            
+            return self.prompts.parse_link_response(response.choices[0].message.content, cache_key)
+            
+        except Exception as e:
+            logger.error(f"Error getting relevant links: {e}")
+            return []
+    
+    def fetch_landing(self, url, tracer: StageTracer):
+        """Fetch the landing page inside a landing_fetch stage"""
+        with tracer.span('landing_fetch', url=url) as span:
+            main_website = self.fetch_engine.fetch(url, landing=True)
+            span.update(ok=main_website.is_valid(), bytes=main_website.bytes_fetched)
+        return main_website
+    
+    def get_all_details(self, url, metrics: ScrapeMetrics = None, tracer: StageTracer = None):
+        """Scrape main website and relevant linked pages"""
+        metrics = metrics if metrics is not None else ScrapeMetrics()
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        
+        # Get main website
+        main_website = self.fetch_landing(url, tracer)
+        if not main_website.is_valid():
+            return f"Error: Could not access {url}. {main_website.error}"
+        
+        # Speculatively fetch the likeliest pages while the model picks links
+        guesses, prefetched = self.prompts.start_prefetch(
+            main_website, self.fetch_engine, self.prefetch_workers
+        )
+        
+        # Get relevant links
+        with tracer.span('link_selection') as span:
+            relevant_links = self.prompts.select_links(self.get_relevant_links(main_website))
+            span['links'] = len(relevant_links)
+        
+        # Fetch linked pages concurrently, assembling them in the original order.
+        # No further pages are scheduled once the context budget is full.
+        pages = self.fetch_engine.iter_fetch((link['url'] for link in relevant_links), prefetched)
+        try:
+            sections = self.prompts.collect_sections(
+                main_website, tracer.trace_pages(zip(relevant_links, pages), len(relevant_links)), metrics
+            )
+        finally:
+            pages.close()
+            # Drop prefetches for pages the model rejected
+            for future in prefetched.values():
+                future.cancel()
+        
+        with tracer.span('prompt_build') as span:
+            result = self.prompts.pack_sections(sections, metrics)
+            span['tokens'] = metrics.tokens_used
+        
+        self.prompts.record_prefetch(prefetched, guesses, metrics)
+        self.prompts.log_metrics(url, relevant_links, metrics)
+        return result
+    
+    def _stream_completion(self, system_prompt, user_prompt, regenerate=False):
+        """
+        Stream brochure text from the model for the given prompts. Cached
+        completions are replayed as a stream; regenerate skips the lookup
+        and replaces the cached entry.
+        """
+        cache_key = self.prompts.completion_cache_key(system_prompt, user_prompt)
+        cached = self.prompts.cached_completion(cache_key, regenerate)
+        if cached is not None:
+            yield from self.prompts.replay_completion(cached)
+            return
+        
+        parts = []
+        try:
+            # Fixed: Use chat.completions.create for streaming, not completions.create
+            stream = self.client.chat.completions.create(
+                model=MODEL,
+                messages=self.prompts.brochure_messages(system_prompt, user_prompt),
+                temperature=TEMPERATURE,
+                stream=True,
+                timeout=60
+            )
+            
+            for chunk in stream:
+                if chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                    
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            yield f"Error generating brochure: {str(e)}"
+            return
+        
+        # Only complete streams are cached
+        self.prompts.store_completion(cache_key, parts)
+    
+    def stream_brochure(self, company_name, url, language="English", 
+                       tone="Professional", tracer: StageTracer = None, regenerate=False):
+        """Generate brochure with streaming response"""
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        try:
+            website_content = self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            yield f"Error generating brochure: {str(e)}"
+            return
+        
+        if website_content.startswith("Error:"):
+            yield website_content
+            return
+        
+        timer = tracer.generation(self.prompts.counter, language=language, tone=tone)
+        for chunk in self._stream_completion(
+            self.prompts.get_brochure_system_prompt(language, tone),
+            self.prompts.get_brochure_user_prompt(company_name, website_content),
+            regenerate
+        ):
+            timer.chunk(chunk)
+            yield chunk
+        timer.finish()
+    
+    def stream_brochure_progressive(self, company_name, url, language="English",
+                                    tone="Professional", tracer: StageTracer = None,
+                                    regenerate=False):
+        """
+        Generate the brochure in phases that start before every page has
+        been scraped. The name, tagline and overview are written from the
+        landing page alone while linked pages are still loading; later
+        sections are written once their source pages arrive. The phases
+        stream out as one Markdown document with the usual 7 sections.
+        """
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        main_website = self.fetch_landing(url, tracer)
+        if not main_website.is_valid():
+            yield f"Error: Could not access {url}. {main_website.error}"
+            return
+        
+        metrics = ScrapeMetrics()
+        scrape = ProgressiveScrape(self, main_website, tracer)
+        brochure = ""
+        
+        try:
+            for index, (section_numbers, keywords) in enumerate(PROGRESSIVE_PHASES):
+                last_phase = index == len(PROGRESSIVE_PHASES) - 1
+                pages = scrape.wait_for(keywords) if keywords != () else []
+                scrape.emit_spans()
+                with tracer.span('prompt_build', phase=index + 1) as span:
+                    phase_metrics = metrics if last_phase else ScrapeMetrics()
+                    website_content = self.prompts.format_details(main_website, pages, phase_metrics)
+                    span['tokens'] = phase_metrics.tokens_used
+                
+                if brochure:
+                    brochure += "\n\n"
+                    yield "\n\n"
+                
+                timer = tracer.generation(
+                    self.prompts.counter, language=language, tone=tone, phase=index + 1
+                )
+                for chunk in self._stream_completion(
+                    self.prompts.get_brochure_section_prompt(language, tone, section_numbers, brochure),
+                    self.prompts.get_brochure_continuation_prompt(company_name, website_content, brochure),
+                    regenerate
+                ):
+                    if chunk.startswith("Error generating brochure"):
+                        yield chunk
+                        return
+                    timer.chunk(chunk)
+                    brochure += chunk
+                    # Report pages that arrived while this phase was being written
+                    scrape.emit_spans()
+                    yield chunk
+                timer.finish()
+        finally:
+            # Stop selecting and fetching pages if the consumer stopped early
+            scrape.cancel()
+        
+        self.prompts.log_metrics(url, scrape.links or [], metrics)
+    
+    def stream_variants(self, company_name, url, variants, max_workers=4,
+                        tracer: StageTracer = None, regenerate=False):
+        """
+        Scrape the website once and stream brochures for several
+        (language, tone) variants concurrently. Yields (variant, chunk)
+        tuples in the order chunks arrive.
+        """
+        variants = list(dict.fromkeys(tuple(variant) for variant in variants))
+        if not variants:
+            return
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        
+        try:
+            website_content = self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            website_content = f"Error generating brochure: {str(e)}"
+        
+        if website_content.startswith("Error"):
+            for variant in variants:
+                yield variant, website_content
+            return
+        
+        user_prompt = self.prompts.get_brochure_user_prompt(company_name, website_content)
+        chunks = queue.Queue()
+        finished = object()
+        stop = threading.Event()
+        
+        def generate(variant):
+            try:
+                language, tone = variant
+                system_prompt = self.prompts.get_brochure_system_prompt(language, tone)
+                for chunk in self._stream_completion(system_prompt, user_prompt, regenerate):
+                    if stop.is_set():
+                        break
+                    chunks.put((variant, chunk))
+            finally:
+                chunks.put((variant, finished))
+        
+        # Timings are recorded here, on the consumer's thread, so that stage
+        # listeners never run on worker threads
+        timers = {
+            variant: tracer.generation(self.prompts.counter, language=variant[0], tone=variant[1])
+            for variant in variants
         }
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(variants)))
+        try:
+            for variant in variants:
+                executor.submit(generate, variant)
+            
+            remaining = len(variants)
+            while remaining:
+                variant, chunk = chunks.get()
+                if chunk is finished:
+                    timers[variant].finish()
+                    remaining -= 1
+                    continue
+                timers[variant].chunk(chunk)
+                yield variant, chunk
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+    
+    def stream_translated_variants(self, company_name, url, variants, max_workers=4,
+                                   tracer: StageTracer = None, regenerate=False):
+        """
+        Like stream_variants, but only one master brochure per tone (in the
+        first language listed for it) is written from the website content.
+        The other languages are translated concurrently from the finished
+        master Markdown, so each extra language sends the short brochure to
+        the model rather than the whole scraped context.
         """
+        variants = list(dict.fromkeys(tuple(variant) for variant in variants))
+        if not variants:
+            return
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        
+        translations = self.prompts.plan_translations(variants)
+        
+        try:
+            website_content = self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            website_content = f"Error generating brochure: {str(e)}"
+        
+        if website_content.startswith("Error"):
+            for variant in variants:
+                yield variant, website_content
+            return
+        
+        user_prompt = self.prompts.get_brochure_user_prompt(company_name, website_content)
+        chunks = queue.Queue()
+        started = object()
+        finished = object()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(variants)))
+        
+        def stream(variant, system_prompt, prompt):
+            """Stream one completion into the queue; returns its text, or None on failure"""
+            parts = []
+            chunks.put((variant, started))
+            try:
+                for chunk in self._stream_completion(system_prompt, prompt, regenerate):
+                    if stop.is_set():
+                        return None
+                    chunks.put((variant, chunk))
+                    if chunk.startswith("Error generating brochure"):
+                        return None
+                    parts.append(chunk)
+                return "".join(parts)
+            finally:
+                chunks.put((variant, finished))
+        
+        def translate(variant, master_brochure):
+            language, tone = variant
+            translation = stream(
+                variant,
+                self.prompts.get_translation_system_prompt(language, tone),
+                self.prompts.get_translation_user_prompt(master_brochure)
+            )
+            if translation is not None and markdown_outline(translation) != markdown_outline(master_brochure):
+                logger.warning(f"{language} translation of the {company_name} brochure changed its Markdown structure")
+        
+        def generate_master(master):
+            language, tone = master
+            master_brochure = stream(master, self.prompts.get_brochure_system_prompt(language, tone), user_prompt)
+            for variant in translations[master]:
+                if master_brochure is None:
+                    chunks.put((variant, started))
+                    chunks.put((variant, f"Error generating brochure: the {language} master brochure failed"))
+                    chunks.put((variant, finished))
+                    continue
+                try:
+                    executor.submit(translate, variant, master_brochure)
+                except RuntimeError:
+                    # The consumer stopped and the pool is shut down
+                    return
+        
+        # Timers are created and fed on the consumer's thread, so stage
+        # listeners never run on worker threads
+        timers = {}
+        try:
+            for master in translations:
+                executor.submit(generate_master, master)
+            
+            remaining = len(variants)
+            while remaining:
+                variant, chunk = chunks.get()
+                if chunk is started:
+                    timers[variant] = tracer.generation(
+                        self.prompts.counter, language=variant[0], tone=variant[1],
+                        translated=variant not in translations
+                    )
+                    continue
+                if chunk is finished:
+                    timers[variant].finish()
+                    remaining -= 1
+                    continue
+                timers[variant].chunk(chunk)
+                yield variant, chunk
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
 
-    def links_user_prompt(self, website: Website):
-        prompt = f"""Here is the list of links from the website {website.url} - 
-        please decide which of these are relevant web links for a brochure about the company.
-        Respond with the full https URL in JSON format. 
-        Do not include Terms of Service, Privacy Policy, email links, or social media links.
+class AsyncBrochureGenerator:
+    """
+    Async counterpart of BrochureGenerator built on AsyncOpenAI and
+    AsyncFetchEngine, so many generations can share one event loop.
+    Uses the same BrochurePrompts and produces the same output.
+    """
+    
+    def __init__(self, api_key, model, fetch_engine: AsyncFetchEngine = None,
+                 prompts: BrochurePrompts = None, prefetch_workers: int = 2,
+                 max_connections: int = 20, **prompt_options):
+        if not validate_api_key(api_key):
+            raise ValueError("Invalid OpenAI API key format")
         
-        Links:
-        """
-        prompt += "\n".join(website.links[:50])
-        return prompt
+        self.api_key = api_key
+        self.fetch_engine = fetch_engine or AsyncFetchEngine()
+        self.prompts = prompts or BrochurePrompts(**prompt_options)
+        self.prefetch_workers = prefetch_workers
+        self.max_connections = max_connections
+        self._client = None
+        self._client_lock = threading.Lock()
     
-    def get_relevant_links(self, website: Website):
+    @property
+    def client(self):
+        """AsyncOpenAI client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from openai import AsyncOpenAI
+                    self._client = AsyncOpenAI(api_key=self.api_key, http_client=httpx.AsyncClient(
+                        limits=openai_http_limits(self.max_connections),
+                        timeout=httpx.Timeout(60.0, connect=10.0)
+                    ))
+        return self._client
+    
+    async def get_relevant_links(self, website: Website):
         """Get relevant links using AI"""
+        picks, candidates = self.prompts.rank_links(website)
+        if picks:
+            return picks
+        if not candidates:
+            return []
+        
+        cache_key = self.prompts.link_cache_key(website, candidates)
+        cached = self.prompts.link_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Link selection cache hit for {website.url}")
+            return cached
+        
         try:
-            response = openai.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=MODEL,
-                messages=[
-                    {'role': 'system', 'content': self.link_system_prompt()},
-                    {'role': 'user', 'content': self.links_user_prompt(website)}
-                ],
+                messages=self.prompts.link_messages(website, candidates),
                 response_format={'type': 'json_object'},
                 timeout=30
             )
             
-            result = json.loads(response.choices[0].message.content)
-            return result.get('links', [])
+            return self.prompts.parse_link_response(response.choices[0].message.content, cache_key)
             
         except Exception as e:
             logger.error(f"Error getting relevant links: {e}")
             return []
     
-    def get_all_details(self, url):
+    async def fetch_landing(self, url, tracer: StageTracer):
+        """Fetch the landing page inside a landing_fetch stage"""
+        with tracer.span('landing_fetch', url=url) as span:
+            main_website = await self.fetch_engine.fetch(url, landing=True)
+            span.update(ok=main_website.is_valid(), bytes=main_website.bytes_fetched)
+        return main_website
+    
+    async def get_all_details(self, url, metrics: ScrapeMetrics = None, tracer: StageTracer = None):
         """Scrape main website and relevant linked pages"""
-        result = "Landing page:\n"
+        metrics = metrics if metrics is not None else ScrapeMetrics()
+        tracer = tracer if tracer is not None else StageTracer(job=url)
         
-        # Get main website
-        main_website = Website(url)
+        main_website = await self.fetch_landing(url, tracer)
         if not main_website.is_valid():
             return f"Error: Could not access {url}. {main_website.error}"
         
-        result += main_website.get_contents()
-        
-        # Get relevant links
-        relevant_links = self.get_relevant_links(main_website)
-        
-        for link in relevant_links[:20]:
-            try:
-                link_website = Website(link['url'])
-                if link_website.is_valid():
-                    result += f"\n\n{link['type']}:\n"
-                    result += link_website.get_contents()
-                time.sleep(1)  # Rate limiting
-            except Exception as e:
-                logger.warning(f"Could not scrape {link['url']}: {e}")
-                continue
-        
-        return result[:25000]  # Truncate if too long
-    
-    def get_brochure_system_prompt(self, language, tone):
-        """Generate system prompt for brochure creation"""
-        lang_instruction = f" in {language}" if language != "English" else ""
-        
-        return f"""You are an expert marketing copywriter that analyzes company website content 
-        and creates compelling brochures for prospective customers, investors, and recruits.
+        # Speculatively fetch the likeliest pages while the model picks links
+        guesses, prefetched = self.prompts.start_prefetch(
+            main_website, self.fetch_engine, self.prefetch_workers
+        )
         
-        Write the brochure{lang_instruction} with a {tone} tone.
+        with tracer.span('link_selection') as span:
+            relevant_links = self.prompts.select_links(await self.get_relevant_links(main_website))
+            span['links'] = len(relevant_links)
         
-        Structure the brochure with:
-        1. Company name and tagline
-        2. About/Overview section
-        3. Products/Services
-        4. Company culture and values
-        5. Customer focus
-        6. Career opportunities (if available)
-        7. Contact information
+        # Consume pages in order, cancelling the rest once the budget is full
+        linked_pages = []
+        chars = len(main_website.text)
+        bytes_fetched = main_website.bytes_fetched
+        pages = self.fetch_engine.iter_fetch((link['url'] for link in relevant_links), prefetched)
+        try:
+            if not self.prompts.context_full(chars, bytes_fetched):
+                start = time.perf_counter()
+                async for link_website in pages:
+                    link = relevant_links[len(linked_pages)]
+                    linked_pages.append((link, link_website))
+                    tracer.record_page(link, link_website, len(linked_pages), len(relevant_links), start)
+                    start = time.perf_counter()
+                    bytes_fetched += link_website.bytes_fetched
+                    if link_website.is_valid():
+                        chars += len(link_website.text)
+                    if self.prompts.context_full(chars, bytes_fetched):
+                        break
+        finally:
+            await pages.aclose()
+            # Drop prefetches for pages the model rejected
+            for task in prefetched.values():
+                task.cancel()
         
-        Use markdown formatting and make it visually appealing and professional.
-        Include specific details from the website content provided.
-        """
+        with tracer.span('prompt_build') as span:
+            result = self.prompts.format_details(main_website, linked_pages, metrics)
+            span['tokens'] = metrics.tokens_used
+        self.prompts.record_prefetch(prefetched, guesses, metrics)
+        self.prompts.log_metrics(url, relevant_links, metrics)
+        return result
     
-    def get_brochure_user_prompt(self, company_name, website_content):
-        """Generate user prompt for brochure creation"""
-        return f"""Company name: {company_name}
-        
-        Here is the website content to analyze:
-        {website_content}
+    async def _stream_completion(self, system_prompt, user_prompt, regenerate=False):
+        """Stream brochure text from the model for the given prompts, replaying cached completions"""
+        cache_key = self.prompts.completion_cache_key(system_prompt, user_prompt)
+        cached = self.prompts.cached_completion(cache_key, regenerate)
+        if cached is not None:
+            for chunk in self.prompts.replay_completion(cached):
+                yield chunk
+            return
         
-        Create a comprehensive marketing brochure based on this information.
-        """
-    
-    def stream_brochure(self, company_name, url, language="English", 
-                       tone="Professional"):
-        """Generate brochure with streaming response"""
+        parts = []
         try:
-            website_content = self.get_all_details(url)
-            
-            if website_content.startswith("Error:"):
-                yield website_content
-                return
-            
-            # Fixed: Use chat.completions.create for streaming, not completions.create
-            stream = openai.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=MODEL,
-                messages=[
-                    {'role': 'system', 'content': self.get_brochure_system_prompt(language, tone)},
-                    {'role': 'user', 'content': self.get_brochure_user_prompt(company_name, website_content)}
-                ],
-                temperature=0.7,
+                messages=self.prompts.brochure_messages(system_prompt, user_prompt),
+                temperature=TEMPERATURE,
                 stream=True,
                 timeout=60
             )
             
-            for chunk in stream:
+            async for chunk in stream:
                 if chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
                     yield chunk.choices[0].delta.content
                     
         except Exception as e:
             logger.error(f"Error streaming brochure: {e}")
             yield f"Error generating brochure: {str(e)}"
+            return
+        
+        self.prompts.store_completion(cache_key, parts)
+    
+    async def stream_brochure(self, company_name, url, language="English",
+                              tone="Professional", tracer: StageTracer = None, regenerate=False):
+        """Generate brochure with streaming response"""
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        try:
+            website_content = await self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            yield f"Error generating brochure: {str(e)}"
+            return
+        
+        if website_content.startswith("Error:"):
+            yield website_content
+            return
+        
+        timer = tracer.generation(self.prompts.counter, language=language, tone=tone)
+        async for chunk in self._stream_completion(
+            self.prompts.get_brochure_system_prompt(language, tone),
+            self.prompts.get_brochure_user_prompt(company_name, website_content),
+            regenerate
+        ):
+            timer.chunk(chunk)
+            yield chunk
+        timer.finish()
+    
+    async def stream_brochure_progressive(self, company_name, url, language="English",
+                                          tone="Professional", tracer: StageTracer = None,
+                                          regenerate=False):
+        """
+        Generate the brochure in phases that start before every page has
+        been scraped, as BrochureGenerator.stream_brochure_progressive does.
+        Linked pages are selected and fetched in a task on the same loop.
+        """
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        main_website = await self.fetch_landing(url, tracer)
+        if not main_website.is_valid():
+            yield f"Error: Could not access {url}. {main_website.error}"
+            return
+        
+        metrics = ScrapeMetrics()
+        scrape = AsyncProgressiveScrape(self, main_website, tracer)
+        brochure = ""
+        
+        try:
+            for index, (section_numbers, keywords) in enumerate(PROGRESSIVE_PHASES):
+                last_phase = index == len(PROGRESSIVE_PHASES) - 1
+                pages = await scrape.wait_for(keywords) if keywords != () else []
+                with tracer.span('prompt_build', phase=index + 1) as span:
+                    phase_metrics = metrics if last_phase else ScrapeMetrics()
+                    website_content = self.prompts.format_details(main_website, pages, phase_metrics)
+                    span['tokens'] = phase_metrics.tokens_used
+                
+                if brochure:
+                    brochure += "\n\n"
+                    yield "\n\n"
+                
+                timer = tracer.generation(
+                    self.prompts.counter, language=language, tone=tone, phase=index + 1
+                )
+                async for chunk in self._stream_completion(
+                    self.prompts.get_brochure_section_prompt(language, tone, section_numbers, brochure),
+                    self.prompts.get_brochure_continuation_prompt(company_name, website_content, brochure),
+                    regenerate
+                ):
+                    if chunk.startswith("Error generating brochure"):
+                        yield chunk
+                        return
+                    timer.chunk(chunk)
+                    brochure += chunk
+                    yield chunk
+                timer.finish()
+        finally:
+            # Stop fetching pages if the consumer stopped early
+            scrape.cancel()
+        
+        self.prompts.log_metrics(url, scrape.links or [], metrics)
+    
+    async def stream_variants(self, company_name, url, variants, max_workers=4,
+                              tracer: StageTracer = None, regenerate=False):
+        """
+        Scrape the website once and stream brochures for several
+        (language, tone) variants, at most max_workers at a time. Yields
+        (variant, chunk) tuples in the order chunks arrive.
+        """
+        variants = list(dict.fromkeys(tuple(variant) for variant in variants))
+        if not variants:
+            return
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        
+        try:
+            website_content = await self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            website_content = f"Error generating brochure: {str(e)}"
+        
+        if website_content.startswith("Error"):
+            for variant in variants:
+                yield variant, website_content
+            return
+        
+        import asyncio
+        
+        user_prompt = self.prompts.get_brochure_user_prompt(company_name, website_content)
+        chunks = asyncio.Queue()
+        finished = object()
+        slots = asyncio.Semaphore(max_workers)
+        
+        async def generate(variant):
+            try:
+                language, tone = variant
+                system_prompt = self.prompts.get_brochure_system_prompt(language, tone)
+                async with slots:
+                    async for chunk in self._stream_completion(system_prompt, user_prompt, regenerate):
+                        await chunks.put((variant, chunk))
+            finally:
+                await chunks.put((variant, finished))
+        
+        timers = {
+            variant: tracer.generation(self.prompts.counter, language=variant[0], tone=variant[1])
+            for variant in variants
+        }
+        tasks = [asyncio.create_task(generate(variant)) for variant in variants]
+        try:
+            remaining = len(variants)
+            while remaining:
+                variant, chunk = await chunks.get()
+                if chunk is finished:
+                    timers[variant].finish()
+                    remaining -= 1
+                    continue
+                timers[variant].chunk(chunk)
+                yield variant, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_translated_variants(self, company_name, url, variants, max_workers=4,
+                                         tracer: StageTracer = None, regenerate=False):
+        """
+        Like stream_variants, but write one master brochure per tone and
+        translate it into that tone's other languages, as
+        BrochureGenerator.stream_translated_variants does. At most
+        max_workers completions stream at a time.
+        """
+        variants = list(dict.fromkeys(tuple(variant) for variant in variants))
+        if not variants:
+            return
+        tracer = tracer if tracer is not None else StageTracer(job=url)
+        
+        translations = self.prompts.plan_translations(variants)
+        
+        try:
+            website_content = await self.get_all_details(url, tracer=tracer)
+        except Exception as e:
+            logger.error(f"Error streaming brochure: {e}")
+            website_content = f"Error generating brochure: {str(e)}"
+        
+        if website_content.startswith("Error"):
+            for variant in variants:
+                yield variant, website_content
+            return
+        
+        import asyncio
+        
+        user_prompt = self.prompts.get_brochure_user_prompt(company_name, website_content)
+        chunks = asyncio.Queue()
+        started = object()
+        finished = object()
+        slots = asyncio.Semaphore(max_workers)
+        tasks = []
+        
+        async def stream(variant, system_prompt, prompt):
+            """Stream one completion into the queue; returns its text, or None on failure"""
+            async with slots:
+                parts = []
+                await chunks.put((variant, started))
+                try:
+                    async for chunk in self._stream_completion(system_prompt, prompt, regenerate):
+                        await chunks.put((variant, chunk))
+                        if chunk.startswith("Error generating brochure"):
+                            return None
+                        parts.append(chunk)
+                    return "".join(parts)
+                finally:
+                    await chunks.put((variant, finished))
+        
+        async def translate(variant, master_brochure):
+            language, tone = variant
+            translation = await stream(
+                variant,
+                self.prompts.get_translation_system_prompt(language, tone),
+                self.prompts.get_translation_user_prompt(master_brochure)
+            )
+            if translation is not None and markdown_outline(translation) != markdown_outline(master_brochure):
+                logger.warning(f"{language} translation of the {company_name} brochure changed its Markdown structure")
+        
+        async def generate_master(master):
+            language, tone = master
+            master_brochure = await stream(master, self.prompts.get_brochure_system_prompt(language, tone), user_prompt)
+            for variant in translations[master]:
+                if master_brochure is None:
+                    await chunks.put((variant, started))
+                    await chunks.put((variant, f"Error generating brochure: the {language} master brochure failed"))
+                    await chunks.put((variant, finished))
+                    continue
+                tasks.append(asyncio.create_task(translate(variant, master_brochure)))
+        
+        timers = {}
+        tasks.extend(asyncio.create_task(generate_master(master)) for master in translations)
+        try:
+            remaining = len(variants)
+            while remaining:
+                variant, chunk = await chunks.get()
+                if chunk is started:
+                    timers[variant] = tracer.generation(
+                        self.prompts.counter, language=variant[0], tone=variant[1],
+                        translated=variant not in translations
+                    )
+                    continue
+                if chunk is finished:
+                    timers[variant].finish()
+                    remaining -= 1
+                    continue
+                timers[variant].chunk(chunk)
+                yield variant, chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+
+MD_HEADING = re.compile(r'^(#{1,6})\s+(.*?)(?:\s+#+)?$')
+MD_RULE = re.compile(r'^([-*_])(\s*\1){2,}$')
+MD_TABLE_DIVIDER = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+MD_LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+MD_CODE = re.compile(r'`([^`]+)`')
+MD_BOLD = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+MD_ITALIC = re.compile(r'(?<![\w*])(\*|_)(?=\S)(.+?)(?<=\S)\1(?![\w*])')
+MD_LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+LIST_BULLETS = ['•', '–', '·']
+
+def markdown_outline(text: str):
+    """Block structure of Markdown text (heading levels, list nesting, table rows, rules), ignoring its wording"""
+    outline = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        heading = MD_HEADING.match(stripped)
+        item = MD_LIST_ITEM.match(line)
+        if heading:
+            outline.append(f"h{len(heading.group(1))}")
+        elif MD_RULE.match(stripped):
+            outline.append('hr')
+        elif stripped.startswith('|'):
+            outline.append(f"row{stripped.count('|')}")
+        elif item:
+            outline.append(f"li{len(item.group(1).expandtabs(4))}")
+    return outline
 
 class PDFExporter:
     """
@@ -265,11 +2797,16 @@ class PDFExporter:
     """
     
     def __init__(self):
+        from reportlab.lib.styles import getSampleStyleSheet
+        
         self.styles = getSampleStyleSheet()
+        self._list_styles = {}
         self.setup_custom_styles()
     
     def setup_custom_styles(self):
         """Setup custom paragraph styles"""
+        from reportlab.lib.styles import ParagraphStyle
+        
         self.styles.add(ParagraphStyle(
             name='CustomTitle',
             parent=self.styles['Title'],
@@ -285,39 +2822,311 @@ class PDFExporter:
             spaceAfter=12,
             textColor='#34495e'
         ))
+        
+        self.styles.add(ParagraphStyle(
+            name='CustomQuote',
+            parent=self.styles['Italic'],
+            leftIndent=18,
+            textColor='#555555'
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='CustomTableCell',
+            parent=self.styles['Normal'],
+            fontSize=9,
+            leading=11
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='CustomTableHeader',
+            parent=self.styles['CustomTableCell'],
+            fontName='Helvetica-Bold'
+        ))
+        
+        from reportlab.platypus import TableStyle
+        
+        self.table_style = TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, '#bdc3c7'),
+            ('BACKGROUND', (0, 0), (-1, 0), '#ecf0f1'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
     
-    def markdown_to_pdf(self, markdown_content, filename):
-        """Convert markdown content to PDF"""
-        try:
-            # Convert markdown to HTML
-            html_content = markdown.markdown(markdown_content)
+    def build_story(self, markdown_content):
+        """
+        Convert markdown content to a list of ReportLab flowables in a
+        single pass over its lines, without an HTML round trip. Supports
+        headings, paragraphs, nested lists, tables, block quotes, code
+        blocks, horizontal rules and bold/italic/code/link runs.
+        """
+        from reportlab.platypus import Spacer, Preformatted
+        from reportlab.platypus.flowables import HRFlowable
+        
+        story = []
+        paragraph = []
+        lines = markdown_content.splitlines()
+        index = 0
+        
+        def flush_paragraph():
+            if paragraph:
+                story.append(self.paragraph(" ".join(paragraph), self.styles['Normal']))
+                story.append(Spacer(1, 12))
+                paragraph.clear()
+        
+        while index < len(lines):
+            line = lines[index]
+            stripped = line.strip()
+            
+            if not stripped:
+                flush_paragraph()
+                index += 1
+                continue
+            
+            if stripped.startswith('```'):
+                flush_paragraph()
+                code = []
+                index += 1
+                while index < len(lines) and not lines[index].strip().startswith('```'):
+                    code.append(lines[index])
+                    index += 1
+                story.append(Preformatted("\n".join(code), self.styles['Code']))
+                story.append(Spacer(1, 12))
+                index += 1
+                continue
             
-            # Create PDF document
-            doc = SimpleDocTemplate(filename, pagesize=letter)
-            story = []
+            heading = MD_HEADING.match(stripped)
+            if heading:
+                flush_paragraph()
+                level = len(heading.group(1))
+                style = 'CustomTitle' if level == 1 else 'CustomHeading' if level <= 3 else 'Heading4'
+                story.append(self.paragraph(heading.group(2), self.styles[style]))
+                story.append(Spacer(1, 12))
+                index += 1
+                continue
             
-            # Parse HTML and convert to PDF elements
-            soup = BeautifulSoup(html_content, 'html.parser')
+            if MD_RULE.match(stripped):
+                flush_paragraph()
+                story.append(HRFlowable(width='100%', color='#bdc3c7', spaceBefore=6, spaceAfter=12))
+                index += 1
+                continue
             
-            for element in soup.find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol']):
-                if element.name == 'h1':
-                    story.append(Paragraph(element.get_text(), self.styles['CustomTitle']))
-                elif element.name in ['h2', 'h3']:
-                    story.append(Paragraph(element.get_text(), self.styles['CustomHeading']))
-                elif element.name == 'p':
-                    story.append(Paragraph(element.get_text(), self.styles['Normal']))
-                elif element.name in ['ul', 'ol']:
-                    for li in element.find_all('li'):
-                        story.append(Paragraph(f"• {li.get_text()}", self.styles['Normal']))
-                
+            if (stripped.startswith('|') and index + 1 < len(lines)
+                    and MD_TABLE_DIVIDER.match(lines[index + 1].strip())):
+                flush_paragraph()
+                rows = [self.table_cells(stripped)]
+                index += 2
+                while index < len(lines) and lines[index].strip().startswith('|'):
+                    rows.append(self.table_cells(lines[index].strip()))
+                    index += 1
+                story.append(self.build_table(rows))
+                story.append(Spacer(1, 12))
+                continue
+            
+            if MD_LIST_ITEM.match(line):
+                flush_paragraph()
+                index = self.build_list(lines, index, story)
+                story.append(Spacer(1, 12))
+                continue
+            
+            if stripped.startswith('>'):
+                flush_paragraph()
+                quote = []
+                while index < len(lines) and lines[index].strip().startswith('>'):
+                    quote.append(lines[index].strip()[1:].strip())
+                    index += 1
+                story.append(self.paragraph(" ".join(quote), self.styles['CustomQuote']))
                 story.append(Spacer(1, 12))
+                continue
+            
+            paragraph.append(stripped)
+            index += 1
+        
+        flush_paragraph()
+        return story
+    
+    def build_list(self, lines, index, story):
+        """Append a (possibly nested) list starting at lines[index]; returns the next line index"""
+        indents = []
+        counters = []
+        items = []
+        
+        while index < len(lines):
+            line = lines[index]
+            item = MD_LIST_ITEM.match(line)
+            if item:
+                indent = len(item.group(1).expandtabs(4))
+                while indents and indent < indents[-1]:
+                    indents.pop()
+                    counters.pop()
+                if not indents or indent > indents[-1]:
+                    indents.append(indent)
+                    counters.append(0)
+                counters[-1] += 1
+                marker = item.group(2)
+                bullet = f"{counters[-1]}." if marker[0].isdigit() else LIST_BULLETS[(len(indents) - 1) % len(LIST_BULLETS)]
+                items.append([len(indents) - 1, bullet, [item.group(3).strip()]])
+            elif line.strip() and line[:1].isspace() and items:
+                # Continuation of the previous item
+                items[-1][2].append(line.strip())
+            else:
+                break
+            index += 1
+        
+        for level, bullet, text in items:
+            story.append(self.paragraph(" ".join(text), self.list_style(level), bulletText=bullet))
+        return index
+    
+    def list_style(self, level: int):
+        """Paragraph style for list items at the given nesting level, created once"""
+        if level not in self._list_styles:
+            from reportlab.lib.styles import ParagraphStyle
             
-            doc.build(story)
-            return filename
+            self._list_styles[level] = ParagraphStyle(
+                name=f'CustomList{level}',
+                parent=self.styles['Normal'],
+                leftIndent=18 * (level + 1),
+                bulletIndent=18 * level + 6,
+                spaceAfter=3
+            )
+        return self._list_styles[level]
+    
+    @staticmethod
+    def table_cells(row: str):
+        return [cell.strip() for cell in row.strip().strip('|').split('|')]
+    
+    def build_table(self, rows):
+        """Build a table flowable, with the first row as a bold header"""
+        from reportlab.platypus import Table
+        
+        columns = max(len(row) for row in rows)
+        data = [
+            [self.paragraph(cell, self.styles['CustomTableHeader' if number == 0 else 'CustomTableCell'])
+             for cell in row + [''] * (columns - len(row))]
+            for number, row in enumerate(rows)
+        ]
+        table = Table(data, repeatRows=1, hAlign='LEFT')
+        table.setStyle(self.table_style)
+        return table
+    
+    def paragraph(self, text: str, style, **kwargs):
+        """Paragraph for Markdown text, falling back to plain text if its markup does not nest"""
+        from reportlab.platypus import Paragraph
+        
+        try:
+            return Paragraph(self.inline_markup(text), style, **kwargs)
+        except ValueError:
+            plain = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            return Paragraph(plain, style, **kwargs)
+    
+    @staticmethod
+    def inline_markup(text: str) -> str:
+        """Convert Markdown inline formatting to ReportLab paragraph markup"""
+        text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        code_spans = []
+        
+        def stash_code(match):
+            code_spans.append(f'<font face="Courier">{match.group(1)}</font>')
+            return f"\x00{len(code_spans) - 1}\x00"
+        
+        text = MD_CODE.sub(stash_code, text)
+        text = MD_BOLD.sub(r'<b>\2</b>', text)
+        text = MD_ITALIC.sub(r'<i>\2</i>', text)
+        text = MD_LINK.sub(lambda match: f'<link href="{match.group(2).replace(chr(34), "%22")}" color="#2980b9">{match.group(1)}</link>', text)
+        return re.sub(r'\x00(\d+)\x00', lambda match: code_spans[int(match.group(1))], text)
+    
+    def write_pdf(self, markdown_content, output):
+        """Render markdown content as PDF into a file path or any writable binary file object"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate
+        
+        try:
+            doc = SimpleDocTemplate(output, pagesize=letter)
+            doc.build(self.build_story(markdown_content))
+            return output
             
         except Exception as e:
             logger.error(f"Error creating PDF: {e}")
             raise Exception(f"Failed to create PDF: {str(e)}")
+    
+    def markdown_to_pdf(self, markdown_content, filename):
+        """Convert markdown content to PDF"""
+        return self.write_pdf(markdown_content, filename)
+    
+    def markdown_to_pdf_bytes(self, markdown_content) -> bytes:
+        """Render markdown content as PDF in memory and return the bytes"""
+        from io import BytesIO
+        
+        buffer = BytesIO()
+        self.write_pdf(markdown_content, buffer)
+        return buffer.getvalue()
+
+_worker_exporter = None
+
+def _init_pdf_worker():
+    """Build the worker's PDFExporter once and warm its fonts with a tiny render"""
+    global _worker_exporter
+    _worker_exporter = PDFExporter()
+    _worker_exporter.markdown_to_pdf_bytes("# Warm-up")
+
+def _render_pdf_job(markdown_content, filename=None):
+    """Render one PDF in a pool worker, to filename if given, otherwise returning the bytes"""
+    if filename:
+        _worker_exporter.markdown_to_pdf(markdown_content, filename)
+        return filename
+    return _worker_exporter.markdown_to_pdf_bytes(markdown_content)
+
+class BulkPDFExporter:
+    """
+    Renders many brochures to PDF across a process pool. ReportLab layout
+    is CPU-bound and holds the GIL, so threads cannot spread it over cores.
+    Each worker process keeps one PDFExporter, so stylesheets and fonts are
+    set up once per worker rather than once per document.
+    """
+    
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 8)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    @property
+    def executor(self):
+        """Worker pool, started on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    import multiprocessing
+                    # Spawned workers do not inherit the parent's threads and locks
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_pdf_worker
+                    )
+        return self._executor
+    
+    def submit(self, markdown_content, filename=None):
+        """Queue one render; the future resolves to filename, or to the PDF bytes"""
+        return self.executor.submit(_render_pdf_job, markdown_content, filename)
+    
+    def render(self, jobs):
+        """
+        Render (markdown, filename) pairs, yielding (index, result, error)
+        as each finishes. result is the filename, or the PDF bytes when the
+        filename is None.
+        """
+        futures = {
+            self.submit(markdown_content, filename): index
+            for index, (markdown_content, filename) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                logger.error(f"Error creating PDF: {e}")
+                yield futures[future], None, e
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
 def validate_url(url: str):
     """Validate URL format"""
@@ -326,3 +3135,219 @@ def validate_url(url: str):
         return all([result.scheme, result.netloc])
     except:
         return False
+
+
+def read_batch_rows(path: str):
+    """Read (company, url, language, tone) rows from a CSV or JSONL file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        
+        for record in records:
+            yield {
+                'company': record['company'].strip(),
+                'url': record['url'].strip(),
+                'language': (record.get('language') or 'English').strip(),
+                'tone': (record.get('tone') or 'Professional').strip()
+            }
+
+def batch_row_key(row: dict) -> str:
+    return TieredCache.make_key(row['company'], row['url'], row['language'], row['tone'])
+
+class BatchCheckpoint:
+    """
+    Append-only record of completed batch rows, so that an interrupted
+    batch run can resume where it stopped.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+    
+    def __contains__(self, key):
+        return key in self.completed
+    
+    def mark(self, key: str):
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(key + "\n")
+            self.completed.add(key)
+
+class BatchWriter:
+    """
+    Writes generated brochures as Markdown or PDF files in a directory, or
+    as lines of a single JSONL file.
+    """
+    
+    def __init__(self, output: str, output_format: str = 'md', pdf_workers: int = None):
+        self.output = output
+        self.output_format = output_format
+        self.lock = threading.Lock()
+        self.pdf_exporter = BulkPDFExporter(pdf_workers) if output_format == 'pdf' else None
+        if output_format == 'jsonl':
+            directory = os.path.dirname(output)
+        else:
+            directory = output
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def file_stem(row: dict) -> str:
+        name = f"{row['company']}_{row['language']}_{row['tone']}_brochure"
+        return re.sub(r'[^A-Za-z0-9._-]+', '_', name)
+    
+    def write(self, row: dict, content: str):
+        if self.output_format == 'jsonl':
+            with self.lock, open(self.output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({**row, 'brochure': content}, ensure_ascii=False) + "\n")
+        elif self.output_format == 'pdf':
+            path = os.path.join(self.output, self.file_stem(row) + '.pdf')
+            # Wait for the render so rows are only checkpointed once written;
+            # concurrent LLM workers keep several renders in flight
+            self.pdf_exporter.submit(content, path).result()
+        else:
+            path = os.path.join(self.output, self.file_stem(row) + '.md')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+    
+    def close(self):
+        if self.pdf_exporter is not None:
+            self.pdf_exporter.close()
+
+def run_batch(generator: BrochureGenerator, rows, writer: BatchWriter,
+              checkpoint: BatchCheckpoint, scrape_workers: int = 4,
+              llm_workers: int = 4, queue_size: int = 16):
+    """
+    Generate brochures for many rows with a pipelined scheduler. A scrape
+    stage and an LLM stage each run on their own worker threads, joined by a
+    bounded queue that applies backpressure to scraping. Rows that share a
+    URL are scraped once.
+    """
+    stats = {'completed': 0, 'failed': 0, 'skipped': 0}
+    stats_lock = threading.Lock()
+    
+    # Group pending rows by URL, preserving input order
+    jobs = OrderedDict()
+    for row in rows:
+        if batch_row_key(row) in checkpoint:
+            stats['skipped'] += 1
+            continue
+        jobs.setdefault(row['url'], []).append(row)
+    
+    job_iter = iter(jobs.items())
+    job_lock = threading.Lock()
+    scraped = queue.Queue(maxsize=queue_size)
+    
+    def record(outcome):
+        with stats_lock:
+            stats[outcome] += 1
+    
+    def scrape_stage():
+        while True:
+            with job_lock:
+                job = next(job_iter, None)
+            if job is None:
+                return
+            url, url_rows = job
+            try:
+                website_content = generator.get_all_details(url)
+            except Exception as e:
+                website_content = f"Error: {e}"
+            for row in url_rows:
+                scraped.put((row, website_content))
+    
+    def llm_stage():
+        while True:
+            item = scraped.get()
+            if item is None:
+                return
+            row, website_content = item
+            key = batch_row_key(row)
+            try:
+                if website_content.startswith("Error"):
+                    raise RuntimeError(website_content)
+                content = ""
+                for chunk in generator._stream_completion(
+                    generator.prompts.get_brochure_system_prompt(row['language'], row['tone']),
+                    generator.prompts.get_brochure_user_prompt(row['company'], website_content)
+                ):
+                    # A stream that fails part-way ends with an error chunk
+                    # after the text already streamed
+                    if chunk.startswith("Error generating brochure"):
+                        raise RuntimeError(chunk)
+                    content += chunk
+
+                writer.write(row, content)
+                checkpoint.mark(key)
+                record('completed')
+                logger.info(f"Generated brochure for {row['company']} ({row['language']}, {row['tone']})")
+            except Exception as e:
+                record('failed')
+                logger.error(f"Batch row failed for {row['company']} ({row['url']}): {e}")
+    
+    scrapers = [threading.Thread(target=scrape_stage, daemon=True) for _ in range(scrape_workers)]
+    writers = [threading.Thread(target=llm_stage, daemon=True) for _ in range(llm_workers)]
+    for thread in scrapers + writers:
+        thread.start()
+    
+    for thread in scrapers:
+        thread.join()
+    for _ in writers:
+        scraped.put(None)
+    for thread in writers:
+        thread.join()
+    
+    return stats
+
+def cli(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="AI Marketing Brochure Generator")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    batch = subparsers.add_parser('batch', help="Generate brochures for every row of a CSV/JSONL file")
+    batch.add_argument('input', help="CSV or JSONL file with company, url, language and tone columns")
+    batch.add_argument('--output', required=True,
+                       help="Output directory, or a .jsonl file when --format is jsonl")
+    batch.add_argument('--format', choices=['md', 'pdf', 'jsonl'], default='md')
+    batch.add_argument('--checkpoint', help="Checkpoint file used to resume interrupted runs")
+    batch.add_argument('--scrape-workers', type=int, default=4)
+    batch.add_argument('--llm-workers', type=int, default=4)
+    batch.add_argument('--queue-size', type=int, default=16)
+    batch.add_argument('--pdf-workers', type=int,
+                       help="Processes used to render PDFs (default: CPU count, at most 8)")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'batch':
+        checkpoint_path = args.checkpoint
+        if not checkpoint_path:
+            if args.format == 'jsonl':
+                checkpoint_path = args.output + '.checkpoint'
+            else:
+                checkpoint_path = os.path.join(args.output, '.checkpoint')
+        
+        writer = BatchWriter(args.output, args.format, pdf_workers=args.pdf_workers)
+        generator = BrochureGenerator(api_key=os.getenv("OPENAI_API_KEY"), model=MODEL)
+        try:
+            stats = run_batch(
+                generator,
+                read_batch_rows(args.input),
+                writer,
+                BatchCheckpoint(checkpoint_path),
+                scrape_workers=args.scrape_workers,
+                llm_workers=args.llm_workers,
+                queue_size=args.queue_size
+            )
+        finally:
+            writer.close()
+        logger.info(f"Batch finished: {stats}")
+        return 0 if stats['failed'] == 0 else 1
+
+if __name__ == "__main__":
+    raise SystemExit(cli())
@@ -0,0 +1,80 @@
+"""
+Benchmark for cross-page boilerplate deduplication: runs
+BoilerplateDeduplicator over each site's page set, as pack_sections does
+before the prompt is packed, and reports the lines and tokens it dropped
+(lines_deduplicated, tokens_deduplicated) and how long it took.
+
+The first page of each site is treated as its landing page. See
+scripts/corpus.py for the corpus layout; without --corpus a synthetic
+one is generated.
+
+    python scripts/bench_dedup.py [--corpus saved_sites/] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import get_corpus
+from main import BoilerplateDeduplicator, PageSection, ScrapeMetrics, Website
+
+def site_sections(pages, max_chars: int):
+    """Extract a site's pages into page sections, the first as its landing page"""
+    sections = []
+    for index, page in enumerate(pages):
+        website = Website('https://example.com/', fetch=False,
+                          max_chars=max_chars if index else None)
+        website.parse(page)
+        label = "Landing page" if index == 0 else website.title
+        sections.append(PageSection.from_website(label, website, landing=index == 0))
+    return sections
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cross-page boilerplate deduplication")
+    parser.add_argument('--corpus', help="Directory of saved sites (default: a synthetic corpus)")
+    parser.add_argument('--sites', type=int, default=10, help="Synthetic sites to generate")
+    parser.add_argument('--max-chars', type=int, default=25000, help="Per-page character budget")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per site; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    deduplicator = BoilerplateDeduplicator()
+    counter = deduplicator.counter
+    totals = {'lines': 0, 'lines_deduplicated': 0, 'tokens': 0, 'tokens_deduplicated': 0, 'seconds': 0.0}
+
+    sites = get_corpus(args.corpus, args.sites)
+    if not sites:
+        print("FAIL: the corpus has no pages")
+        return 1
+    for name, pages in sites:
+        sections = site_sections(pages, args.max_chars)
+        lines = sum(len([line for line in section.text.split("\n") if line.strip()]) for section in sections)
+        tokens = sum(counter.count(section.text) for section in sections)
+
+        best = None
+        for _ in range(args.repeat):
+            metrics = ScrapeMetrics()
+            start = time.perf_counter()
+            deduplicator.dedupe(sections, metrics)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        print(f"{name}: {len(pages)} pages, {metrics.lines_deduplicated}/{lines} lines and "
+              f"{metrics.tokens_deduplicated}/{tokens} tokens deduplicated in {best * 1000:.1f}ms")
+        totals['lines'] += lines
+        totals['lines_deduplicated'] += metrics.lines_deduplicated
+        totals['tokens'] += tokens
+        totals['tokens_deduplicated'] += metrics.tokens_deduplicated
+        totals['seconds'] += best
+
+    share = totals['tokens_deduplicated'] / totals['tokens'] if totals['tokens'] else 0.0
+    print(f"\nlines_deduplicated: {totals['lines_deduplicated']} of {totals['lines']}")
+    print(f"tokens_deduplicated: {totals['tokens_deduplicated']} of {totals['tokens']} ({share:.1%})")
+    print(f"dedupe time: {totals['seconds'] * 1000:.1f}ms over {len(sites)} sites "
+          f"({totals['seconds'] * 1000 / len(sites):.1f}ms per site)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
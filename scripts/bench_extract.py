@@ -0,0 +1,69 @@
+"""
+Benchmark for page extraction: the streaming lxml extractor
+(extract_html) against the BeautifulSoup path (Website._parse_with_bs4)
+over a corpus of saved HTML pages.
+
+Both are timed on every page, best of --repeat runs, with no page budget
+and again with the per-page character budget FetchEngine applies, where
+the lxml extractor stops parsing early. See scripts/corpus.py for the
+corpus layout; without --corpus a synthetic one is generated.
+
+    python scripts/bench_extract.py [--corpus saved_sites/] [--max-chars 25000]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import get_corpus
+from main import Website, detect_encoding, extract_html
+
+def best_time(parse, pages, repeat: int):
+    """Return (best total seconds over repeat runs, characters extracted)"""
+    best = None
+    for _ in range(repeat):
+        chars = 0
+        start = time.perf_counter()
+        for page in pages:
+            chars += len(parse(page)[1])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, chars
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark lxml against BeautifulSoup page extraction")
+    parser.add_argument('--corpus', help="Directory of saved sites (default: a synthetic corpus)")
+    parser.add_argument('--sites', type=int, default=10, help="Synthetic sites to generate")
+    parser.add_argument('--paragraphs', type=int, default=120, help="Paragraphs per synthetic page")
+    parser.add_argument('--max-chars', type=int, default=25000, help="Per-page character budget")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per engine; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    pages = [page for _, site_pages in get_corpus(args.corpus, args.sites, args.paragraphs)
+             for page in site_pages]
+    if not pages:
+        print("FAIL: the corpus has no pages")
+        return 1
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB of HTML")
+
+    for max_chars in (None, args.max_chars):
+        website = Website('https://example.com/', fetch=False, max_chars=max_chars)
+        engines = {
+            'bs4': website._parse_with_bs4,
+            'lxml': lambda page: extract_html(page, detect_encoding(page), max_chars),
+        }
+        results = {name: best_time(parse, pages, args.repeat) for name, parse in engines.items()}
+        budget = f"{max_chars} chars per page" if max_chars else "no page budget"
+        print(f"\n{budget}:")
+        for name, (elapsed, chars) in results.items():
+            print(f"  {name:5} {elapsed * 1000:8.1f}ms  {len(pages) / elapsed:7.1f} pages/s  "
+                  f"{megabytes / elapsed:6.1f} MB/s  {chars} chars extracted")
+        print(f"  lxml is {results['bs4'][0] / results['lxml'][0]:.1f}x faster")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
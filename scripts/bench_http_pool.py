@@ -0,0 +1,80 @@
+"""
+Benchmark for the shared HTTP connection pool: fetching a site's pages
+with a bare requests.get per page (how Website used to fetch) against
+HTTPClientPool's keep-alive connections.
+
+Pages are served by a local server that counts the TCP connections it
+accepts. Each new connection waits --handshake-ms before it is served,
+standing in for the TCP and TLS handshake round trips to a remote host
+that a reused connection skips; pass 0 to measure raw localhost.
+
+    python scripts/bench_http_pool.py [--pages 20] [--workers 4] [--handshake-ms 30]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import CountingServer, SiteHandler, start, percentile
+from main import USER_AGENT, HTTPClientPool
+
+class HandshakeHandler(SiteHandler):
+    """Serves the test site, after a simulated handshake on each new connection"""
+
+    def setup(self):
+        time.sleep(self.server.handshake)
+        super().setup()
+
+def run(fetch, urls, workers: int):
+    """Fetch every URL with workers threads; return (seconds, per-request latencies)"""
+    def timed(url):
+        start = time.perf_counter()
+        fetch(url)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(timed, urls))
+    return time.perf_counter() - start, latencies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pooled keep-alive fetches against requests.get")
+    parser.add_argument('--pages', type=int, default=20, help="Pages fetched from the site per run")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent fetches")
+    parser.add_argument('--handshake-ms', type=float, default=30, help="Simulated cost of a new connection")
+    parser.add_argument('--latency-ms', type=float, default=5, help="Server latency per request")
+    args = parser.parse_args(argv)
+
+    server = start(CountingServer(HandshakeHandler, args.latency_ms / 1000))
+    server.handshake = args.handshake_ms / 1000
+    urls = [f"{server.url}/"] + [f"{server.url}/page{index}" for index in range(1, args.pages)]
+
+    import requests
+    pool = HTTPClientPool(pool_maxsize=args.workers)
+    clients = {
+        'requests.get': lambda url: requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=10),
+        'HTTPClientPool': lambda url: pool.fetch(url),
+    }
+
+    print(f"{args.pages} pages, {args.workers} workers, {args.handshake_ms:.0f}ms per new connection")
+    results = {}
+    for name, fetch in clients.items():
+        # Warm up imports and, for the pool, its connections, as a running app would have
+        fetch(urls[0])
+        connections = server.connections
+        elapsed, latencies = run(fetch, urls, args.workers)
+        results[name] = elapsed
+        print(f"  {name:15} {elapsed * 1000:7.1f}ms total  p50 {statistics.median(latencies) * 1000:6.1f}ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.1f}ms  "
+              f"{server.connections - connections} connections opened")
+    print(f"  pooled fetches are {results['requests.get'] / results['HTTPClientPool']:.1f}x faster")
+    pool.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark for PDF output: rendering through a temporary file (write the
+PDF to a NamedTemporaryFile path, read it back and unlink it, as the app
+used to) against PDFExporter.markdown_to_pdf_bytes, which renders into a
+BytesIO.
+
+Both paths render the same large brochures after a warm-up render. Each
+size reports the median latency over --repeat runs and the peak memory
+traced by tracemalloc during one render, which covers ReportLab's Python
+allocations and the PDF bytes but not the interpreter's baseline.
+
+    python scripts/bench_pdf_render.py [--sections 50 150 400] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import synthetic_brochure
+from main import PDFExporter
+
+def render_via_temp_file(exporter: PDFExporter, markdown_content: str) -> bytes:
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+        pdf_path = tmp_file.name
+    try:
+        exporter.markdown_to_pdf(markdown_content, pdf_path)
+        with open(pdf_path, 'rb') as pdf_file:
+            return pdf_file.read()
+    finally:
+        os.unlink(pdf_path)
+
+def measure(render, markdown_content: str, repeat: int):
+    """Return (median seconds, peak traced bytes, PDF size) for one render path"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = render(markdown_content)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    render(markdown_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(pdf)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark temp-file against in-memory PDF rendering")
+    parser.add_argument('--sections', type=int, nargs='+', default=[50, 150, 400],
+                        help="Brochure sizes to render, in sections")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed renders per path and size")
+    args = parser.parse_args(argv)
+
+    exporter = PDFExporter()
+    paths = {
+        'temp file': lambda content: render_via_temp_file(exporter, content),
+        'in memory': exporter.markdown_to_pdf_bytes,
+    }
+    # Load fonts and ReportLab modules before timing either path
+    exporter.markdown_to_pdf_bytes(synthetic_brochure(2))
+
+    for sections in args.sections:
+        brochure = synthetic_brochure(sections)
+        print(f"{sections} sections ({len(brochure) // 1000}KB of Markdown):")
+        for name, render in paths.items():
+            elapsed, peak, size = measure(render, brochure, args.repeat)
+            print(f"  {name:10} {elapsed * 1000:8.1f}ms  peak {peak / 1e6:6.1f}MB  {size // 1000}KB PDF")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
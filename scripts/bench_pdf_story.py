@@ -0,0 +1,99 @@
+"""
+Benchmark for PDFExporter.build_story, the single-pass Markdown to
+ReportLab flowables renderer, on large brochures.
+
+For each brochure size it reports the time to build the story, the time
+for the full render including ReportLab's page layout, and the peak
+memory tracemalloc traced while building the story. When the markdown
+package is installed, the HTML round trip the exporter used to make
+(markdown to HTML, then BeautifulSoup find_all over headings, paragraphs
+and lists) is measured alongside it.
+
+    python scripts/bench_pdf_story.py [--sections 50 150 400] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import synthetic_brochure
+from main import PDFExporter
+
+def html_round_trip_story(exporter: PDFExporter, markdown_content: str):
+    """Build the story the way the exporter did before build_story"""
+    import markdown
+    from bs4 import BeautifulSoup
+    from reportlab.platypus import Paragraph, Spacer
+
+    soup = BeautifulSoup(markdown.markdown(markdown_content), 'html.parser')
+    story = []
+    for element in soup.find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol']):
+        if element.name == 'h1':
+            story.append(Paragraph(element.get_text(), exporter.styles['CustomTitle']))
+        elif element.name in ['h2', 'h3']:
+            story.append(Paragraph(element.get_text(), exporter.styles['CustomHeading']))
+        elif element.name == 'p':
+            story.append(Paragraph(element.get_text(), exporter.styles['Normal']))
+        else:
+            for li in element.find_all('li'):
+                story.append(Paragraph(f"• {li.get_text()}", exporter.styles['Normal']))
+        story.append(Spacer(1, 12))
+    return story
+
+def render(story):
+    from io import BytesIO
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    SimpleDocTemplate(BytesIO(), pagesize=letter).build(story)
+
+def median_time(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def peak_memory(function) -> int:
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark build_story on large brochures")
+    parser.add_argument('--sections', type=int, nargs='+', default=[50, 150, 400],
+                        help="Brochure sizes to render, in sections")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per renderer and size")
+    args = parser.parse_args(argv)
+
+    exporter = PDFExporter()
+    builders = {'build_story': exporter.build_story}
+    try:
+        import markdown  # noqa: F401
+        builders['HTML round trip'] = lambda content: html_round_trip_story(exporter, content)
+    except ImportError:
+        print("markdown is not installed; measuring build_story only")
+    # Load fonts and ReportLab modules before timing anything
+    exporter.markdown_to_pdf_bytes(synthetic_brochure(2))
+
+    for sections in args.sections:
+        brochure = synthetic_brochure(sections)
+        print(f"{sections} sections ({len(brochure) // 1000}KB of Markdown):")
+        for name, build in builders.items():
+            story_time = median_time(lambda: build(brochure), args.repeat)
+            render_time = median_time(lambda: render(build(brochure)), args.repeat)
+            peak = peak_memory(lambda: build(brochure))
+            print(f"  {name:15} story {story_time * 1000:7.1f}ms  full render {render_time * 1000:7.1f}ms  "
+                  f"story peak {peak / 1e6:5.1f}MB  {len(build(brochure))} flowables")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""
+Import-time regression check for main.py.
+
+Imports main in a fresh interpreter with python -X importtime and fails
+if a heavy dependency was loaded as a side effect, or if the import took
+longer than the allowed budget.
+
+    python scripts/check_import_time.py [--max-ms 150]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported where they are first used, never at import time
+HEAVY_MODULES = ('reportlab', 'openai', 'bs4', 'requests', 'httpx', 'lxml', 'tiktoken')
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def measure():
+    """Return (cumulative import time of main in ms, heavy modules loaded)"""
+    code = (
+        "import sys, main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match and match.group(4) == 'main' and len(match.group(3)) == 1:
+            cumulative_us = int(match.group(2))
+    if cumulative_us is None:
+        raise RuntimeError("main was not found in the -X importtime output")
+
+    loaded = [module for module in result.stdout.strip().split(',') if module]
+    return cumulative_us / 1000, loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-ms', type=float, default=150.0,
+                        help="Cumulative import time budget for main, in milliseconds")
+    args = parser.parse_args(argv)
+
+    import_ms, loaded = measure()
+    print(f"import main: {import_ms:.1f}ms cumulative (budget {args.max_ms:.0f}ms)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: importing main loaded {', '.join(loaded)}")
+        failed = True
+    if import_ms > args.max_ms:
+        print(f"FAIL: importing main took longer than {args.max_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""
+Page sets and brochures for the benchmark scripts.
+
+A saved corpus is a directory with one subdirectory per website, each
+holding that site's pages as .html files (saved with the browser's "Save
+page as... HTML only", or with curl). Without one, a synthetic corpus of
+marketing sites is generated: every page repeats the site's navigation,
+announcement banner, calls to action, trust blurb and footer around its
+own copy, with inline scripts and styles, as real company sites do. Some
+calls to action mention the page they are on, so they repeat only as
+near-duplicates.
+
+synthetic_brochure builds large Markdown brochures of the shape the model
+writes, with tables, nested lists and bold/italic runs, for the PDF
+benchmarks.
+"""
+import os
+import random
+
+PAGE_TYPES = ['home', 'about', 'products', 'services', 'customers', 'careers', 'contact',
+              'pricing', 'team', 'blog', 'partners', 'security', 'press', 'faq']
+
+WORDS = ('platform customers teams data cloud secure reliable build scale insight workflow '
+         'service partner growth mission support global product solution industry modern '
+         'fast simple trusted analytics automation integration enterprise people value').split()
+
+def load_corpus(path: str):
+    """Return [(site name, [page bytes, ...]), ...] from a saved corpus directory"""
+    sites = []
+    for name in sorted(os.listdir(path)):
+        site_dir = os.path.join(path, name)
+        if not os.path.isdir(site_dir):
+            continue
+        pages = []
+        for filename in sorted(os.listdir(site_dir)):
+            if filename.endswith(('.html', '.htm')):
+                with open(os.path.join(site_dir, filename), 'rb') as f:
+                    pages.append(f.read())
+        if pages:
+            sites.append((name, pages))
+    return sites
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def synthetic_site(index: int, pages: int = 14, paragraphs: int = 40, seed: int = 0):
+    """Return (site name, [page bytes, ...]) for one generated company site"""
+    rng = random.Random(seed * 1000 + index)
+    company = f"Example Co {index}"
+    nav = ''.join(f'<li><a href="/{page}">{page.title()}</a></li>' for page in PAGE_TYPES)
+    cta = (f'<div class="cta"><p>Ready to see how {company} can help your team grow faster? '
+           f'Book a demo with our product specialists today.</p><a href="/contact">Talk to sales</a></div>')
+    banner = f'<div class="banner"><p>New: {company} now integrates with every major cloud provider.</p></div>'
+    trust = ''.join(f'<p>{sentence(rng, 14)}</p>' for _ in range(3))
+    footer = ''.join(f'<p>{sentence(rng, 12)}</p>' for _ in range(6))
+    script = '<script>' + 'window.dataLayer=window.dataLayer||[];' * 200 + '</script>'
+    style = '<style>' + '.hero{margin:0 auto;padding:4rem}' * 200 + '</style>'
+
+    html_pages = []
+    for page in PAGE_TYPES[:pages]:
+        body = [f'<h1>{company} {page.title()}</h1>', cta]
+        page_cta = (f'<p>Ready to see how {company} {page} can help your team grow faster? '
+                    f'Book a demo with our product specialists today.</p>')
+        for number in range(paragraphs):
+            body.append(f'<h2>{sentence(rng, 4)}</h2>' if number % 8 == 0 else
+                        f'<p>{sentence(rng, rng.randint(15, 60))}</p>')
+            if number % 10 == 5:
+                body.append(page_cta)
+        body.append(f'<section class="trust">{trust}</section>')
+        html_pages.append((
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{company} | {page.title()}</title>'
+            f'{style}{script}</head><body>{banner}<header><nav><ul>{nav}</ul></nav></header>'
+            f'<main>{"".join(body)}</main>{script}'
+            f'<footer>{footer}<p>&copy; {company}. All rights reserved.</p></footer></body></html>'
+        ).encode('utf-8'))
+    return company, html_pages
+
+def get_corpus(path: str = None, sites: int = 10, paragraphs: int = 40):
+    """Load the saved corpus at path, or generate a synthetic one"""
+    if path:
+        return load_corpus(path)
+    return [synthetic_site(index, paragraphs=paragraphs) for index in range(sites)]
+
+def synthetic_brochure(sections: int = 150, seed: int = 0) -> str:
+    """Return a Markdown brochure with the given number of sections"""
+    rng = random.Random(seed)
+    parts = ["# Example Co\n\n*Building the future of example products*"]
+    for number in range(1, sections + 1):
+        parts.append(f"## {sentence(rng, 3)[:-1]} {number}")
+        parts.append(f"{sentence(rng, 30)} **{sentence(rng, 4)[:-1]}** and *{sentence(rng, 3)[:-1]}*. "
+                     f"{sentence(rng, 25)}")
+        if number % 3 == 0:
+            items = []
+            for _ in range(4):
+                items.append(f"- **{rng.choice(WORDS).title()}**: {sentence(rng, 10)}")
+                items.extend(f"  - {sentence(rng, 6)}" for _ in range(2))
+            parts.append("\n".join(items))
+        if number % 5 == 0:
+            rows = [f"| {rng.choice(WORDS).title()} | {sentence(rng, 6)} | {rng.randint(1, 99)}% |"
+                    for _ in range(5)]
+            parts.append("\n".join(["| Plan | Details | Share |", "|---|---|---|"] + rows))
+    return "\n\n".join(parts) + "\n"
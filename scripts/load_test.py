@@ -0,0 +1,237 @@
+"""
+Load test for the resources app.py shares across Streamlit sessions: the
+cached generator with its fetch engine, scrape connection pool and OpenAI
+client, and the PDF exporter with its render pool.
+
+Runs many concurrent sessions against local stand-ins, with no network
+access or API key needed:
+
+- several small websites, each on its own port so each counts as a host
+- a fake OpenAI-compatible server that streams chat completions
+
+Each server counts the TCP connections it accepts and the most it had
+open at once. The test fails if any session errors, if a website saw
+more than SCRAPE_PER_HOST connections (the scrape pool discarded and
+reopened connections instead of reusing them), or if more than
+OPENAI_MAX_CONNECTIONS were open to OpenAI at once. The OpenAI SDK
+closes each streamed response after its [DONE] event, so OpenAI
+connections are checked by peak rather than by total.
+
+    python scripts/load_test.py [--sessions 32] [--sites 32]
+
+Sessions that share a site are throttled by its per-host rate limit, as
+they would be in production. Running more sites than SCRAPE_POOL_HOSTS
+evicts host pools and fails the connection check by design.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SUBPAGES = ['about', 'products', 'services', 'customers', 'careers', 'contact']
+
+class CountingServer(ThreadingHTTPServer):
+    """HTTP server that records each accepted connection"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, latency: float):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.connections = 0
+        self.open_connections = 0
+        self.peak_connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+            self.open_connections += 1
+            self.peak_connections = max(self.peak_connections, self.open_connections)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self.lock:
+            self.open_connections -= 1
+        super().shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        # Clients closing kept-alive connections are expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm stalls each response on a kept-alive connection until the
+    # client's delayed ACK, as real servers do not
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+class SiteHandler(QuietHandler):
+    """A company website: a landing page linking to a few subpages"""
+
+    def do_GET(self):
+        self.server.count_request()
+        time.sleep(self.server.latency)
+        path = self.path.strip('/')
+        if not path:
+            links = ''.join(f'<li><a href="/{page}">{page.title()}</a></li>' for page in SUBPAGES)
+            body = (f'<html><head><title>Example Co</title></head><body><h1>Example Co</h1>'
+                    f'<p>We build example products for example customers.</p><ul>{links}</ul></body></html>')
+        else:
+            paragraphs = ''.join(f'<p>{path.title()} paragraph {i}: details about our {path}.</p>' for i in range(40))
+            body = f'<html><head><title>{path.title()}</title></head><body><h2>{path.title()}</h2>{paragraphs}</body></html>'
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class OpenAIHandler(QuietHandler):
+    """Streams chat completions in the OpenAI server-sent events format"""
+
+    chunks = 60
+    chunk_delay = 0.005
+
+    def do_POST(self):
+        self.server.count_request()
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if not request.get('stream'):
+            self.send_json({
+                'id': 'load-test', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': json.dumps({'links': []})}}]
+            })
+            return
+
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = ["# Example Co\n\n"] + [f"word{i} " for i in range(self.chunks)]
+        for word in words:
+            self.send_event({'id': 'load-test', 'object': 'chat.completion.chunk', 'created': 0,
+                             'model': request['model'],
+                             'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]})
+            time.sleep(self.chunk_delay)
+        self.send_chunk(b'data: [DONE]\n\n')
+        self.send_chunk(b'')
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_event(self, payload):
+        self.send_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+def start(server: CountingServer) -> CountingServer:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the resources shared across app sessions")
+    parser.add_argument('--sessions', type=int, default=32, help="Concurrent sessions")
+    parser.add_argument('--sites', type=int, default=32, help="Websites (hosts) the sessions spread over")
+    parser.add_argument('--latency-ms', type=float, default=50, help="Server latency per request")
+    parser.add_argument('--pdf', action=argparse.BooleanOptionalAction, default=True,
+                        help="Also render each brochure on the shared PDF render pool")
+    args = parser.parse_args(argv)
+    latency = args.latency_ms / 1000
+
+    sites = [start(CountingServer(SiteHandler, latency)) for _ in range(args.sites)]
+    openai_server = start(CountingServer(OpenAIHandler, latency))
+    # Read by the OpenAI SDK when the shared client is created
+    os.environ['OPENAI_BASE_URL'] = openai_server.url + '/v1'
+    os.environ.pop('BROCHURE_CACHE_DIR', None)
+
+    # Imported after the environment is set; Streamlit runs in bare mode
+    import app
+
+    api_key = 'sk-load-test'
+    generator = app.get_generator(api_key)
+    if app.get_generator(api_key) is not generator:
+        print("FAIL: get_generator did not return the shared generator")
+        return 1
+
+    def session(index: int):
+        """One user generating a brochure and downloading its PDF"""
+        site = sites[index % len(sites)]
+        start_time = time.perf_counter()
+        content = "".join(generator.stream_brochure(
+            company_name=f"Example Co {index}", url=site.url + '/'
+        ))
+        if content.startswith("Error"):
+            raise RuntimeError(content)
+        if args.pdf:
+            app.get_pdf_render_pool().submit(app.get_pdf_exporter().markdown_to_pdf_bytes, content).result()
+        return time.perf_counter() - start_time
+
+    latencies = []
+    errors = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(session, index) for index in range(args.sessions)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.sessions} sessions over {args.sites} sites in {elapsed:.2f}s")
+    if latencies:
+        print(f"session latency: p50 {statistics.median(latencies):.2f}s, "
+              f"p95 {percentile(latencies, 0.95):.2f}s, max {max(latencies):.2f}s")
+    print(f"sites: {sum(site.requests for site in sites)} requests over "
+          f"{sum(site.connections for site in sites)} connections, at most "
+          f"{max(site.connections for site in sites)} to one site (limit {app.SCRAPE_PER_HOST})")
+    print(f"openai: {openai_server.requests} requests over {openai_server.connections} connections, "
+          f"at most {openai_server.peak_connections} open at once (limit {app.OPENAI_MAX_CONNECTIONS})")
+
+    failures = [f"{len(errors)} sessions failed, first error: {errors[0]}"] if errors else []
+    crowded = [site for site in sites if site.connections > app.SCRAPE_PER_HOST]
+    if crowded:
+        failures.append(f"{len(crowded)} sites saw more than {app.SCRAPE_PER_HOST} connections")
+    if openai_server.peak_connections > app.OPENAI_MAX_CONNECTIONS:
+        failures.append(f"openai had {openai_server.peak_connections} connections open at once, "
+                        f"more than {app.OPENAI_MAX_CONNECTIONS}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())